@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Media
+from .models import Media, MediaJob
 
 @admin.register(Media)
 class MediaAdmin(admin.ModelAdmin):
@@ -88,3 +88,11 @@ class MediaAdmin(admin.ModelAdmin):
             )
         return 'No file'
     file_info.short_description = 'File Information'
+
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'content_type', 'object_id', 'status', 'attempts', 'next_attempt_at', 'created_at', 'updated_at')
+    list_filter = ('status', 'content_type')
+    search_fields = ('object_id', 'error')
+    readonly_fields = ('content_type', 'object_id', 'attempts', 'error', 'next_attempt_at', 'created_at', 'updated_at')
@@ -0,0 +1,86 @@
+import os
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from attachments.processing import claim_media_jobs, run_media_job
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _run_job(job_id):
+    try:
+        return run_media_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Process pending media jobs (thumbnails, collages) in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=0,
+            help='Jobs claimed per round (default: 4 per process)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Reclaim jobs stuck in processing for this many seconds',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        batch_size = options['batch_size'] or processes * 4
+
+        # Forked children must not inherit the parent's database sockets.
+        connections.close_all()
+
+        self.stdout.write(f'Media worker started with {processes} processes')
+        with Pool(processes=processes, initializer=_init_worker) as pool:
+            while True:
+                job_ids = claim_media_jobs(batch_size, stale_after=options['stale_after'])
+                if not job_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                started = time.monotonic()
+                results = pool.map(_run_job, job_ids)
+                elapsed = time.monotonic() - started
+
+                done = sum(1 for _, status in results if status == 'done')
+                self.stdout.write(
+                    self.style.SUCCESS(f'Processed {done}/{len(job_ids)} media jobs in {elapsed:.2f}s')
+                )
+
+        self.stdout.write(self.style.SUCCESS('Media queue is empty'))
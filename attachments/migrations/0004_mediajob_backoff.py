@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachments', '0003_mediajob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediajob',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
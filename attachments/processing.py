@@ -0,0 +1,112 @@
+"""Background post-processing of uploaded media.
+
+Uploads only store the original file and enqueue a ``MediaJob``; the
+``media_worker`` management command claims pending jobs and runs them in a
+process pool. Any model can take part by implementing ``process_media()``,
+which builds its derivatives and stores them with a queryset ``update()``.
+
+An object has at most one pending job. A job that is already running may
+have read a file that has since been replaced, so saving the object again
+queues a new job; it is not claimed until the running one has finished.
+Failed jobs are retried up to ``MAX_ATTEMPTS`` times with growing delays.
+"""
+import logging
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import MediaJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 30
+
+# Sent in the worker process after ``instance.process_media()`` succeeded.
+media_processed = Signal()
+
+
+def enqueue_media_job(instance):
+    content_type = ContentType.objects.get_for_model(instance)
+    already_queued = MediaJob.objects.filter(
+        content_type=content_type,
+        object_id=instance.pk,
+        status='pending',
+    ).exists()
+    if already_queued:
+        return None
+    return MediaJob.objects.create(content_type=content_type, object_id=instance.pk)
+
+
+def claim_media_jobs(limit, stale_after=600):
+    """Mark up to ``limit`` runnable jobs as processing and return their IDs.
+
+    Jobs stuck in ``processing`` for longer than ``stale_after`` seconds are
+    assumed to belong to a dead worker and are claimed again.
+    """
+    now = timezone.now()
+    stale = Q(status='processing', updated_at__lt=now - timedelta(seconds=stale_after))
+    running = MediaJob.objects.filter(
+        content_type=OuterRef('content_type'),
+        object_id=OuterRef('object_id'),
+        status='processing',
+        updated_at__gte=now - timedelta(seconds=stale_after),
+    )
+    runnable = (Q(status='pending', next_attempt_at__lte=now) & ~Exists(running)) | stale
+
+    with transaction.atomic():
+        job_ids = list(
+            MediaJob.objects.select_for_update(skip_locked=True)
+            .filter(runnable)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if job_ids:
+            MediaJob.objects.filter(id__in=job_ids).update(
+                status='processing',
+                attempts=F('attempts') + 1,
+                updated_at=now,
+            )
+    return job_ids
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try of a job that failed ``attempts`` times."""
+    return RETRY_BASE_DELAY * 2 ** (attempts - 1)
+
+
+def run_media_job(job_id):
+    try:
+        job = MediaJob.objects.select_related('content_type').get(pk=job_id)
+    except MediaJob.DoesNotExist:
+        return job_id, 'missing'
+
+    instance = job.content_object
+    if instance is None:
+        MediaJob.objects.filter(pk=job_id).update(status='done', error='Target no longer exists')
+        return job_id, 'done'
+
+    try:
+        instance.process_media()
+    except Exception as e:
+        logger.warning(f"Media job {job_id} failed: {e}", exc_info=True)
+        if job.attempts >= MAX_ATTEMPTS:
+            MediaJob.objects.filter(pk=job_id).update(status='failed', error=str(e))
+            return job_id, 'failed'
+        MediaJob.objects.filter(pk=job_id).update(
+            status='pending',
+            error=str(e),
+            next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+        )
+        return job_id, 'pending'
+
+    MediaJob.objects.filter(pk=job_id).update(status='done', error='')
+    try:
+        media_processed.send(sender=instance.__class__, instance=instance)
+    except Exception as e:
+        logger.warning(f"media_processed receivers failed for job {job_id}: {e}", exc_info=True)
+    return job_id, 'done'
@@ -1,3 +1,47 @@
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Post
+from users.testing import make_user
+
+from .models import MediaJob
+from .processing import MAX_ATTEMPTS, claim_media_jobs, enqueue_media_job, run_media_job
+
+
+class MediaJobTests(TestCase):
+    def setUp(self):
+        author = make_user('author')
+        self.post = Post.objects.create(author=author, content='media')
+        MediaJob.objects.all().delete()
+
+    def test_pending_job_is_not_duplicated(self):
+        self.assertIsNotNone(enqueue_media_job(self.post))
+        self.assertIsNone(enqueue_media_job(self.post))
+
+    def test_replacing_a_file_while_processing_queues_a_new_job(self):
+        job = enqueue_media_job(self.post)
+        self.assertEqual(claim_media_jobs(10), [job.pk])
+
+        again = enqueue_media_job(self.post)
+        self.assertIsNotNone(again)
+        # Not run next to the job that still works on the old file.
+        self.assertEqual(claim_media_jobs(10), [])
+
+        MediaJob.objects.filter(pk=job.pk).update(status='done')
+        self.assertEqual(claim_media_jobs(10), [again.pk])
 
-# Create your tests here.
+    @mock.patch.object(Post, 'process_media', side_effect=ValueError('broken file'))
+    def test_failed_job_backs_off_then_gives_up(self, process_media):
+        job = enqueue_media_job(self.post)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.assertEqual(claim_media_jobs(10), [job.pk])
+            with self.assertLogs('attachments.processing', 'WARNING'):
+                _, status = run_media_job(job.pk)
+            if attempt < MAX_ATTEMPTS:
+                self.assertEqual(status, 'pending')
+                self.assertEqual(claim_media_jobs(10), [])
+                MediaJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(status, 'failed')
+        self.assertEqual(claim_media_jobs(10), [])
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-17 22:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counters(apps, schema_editor):
+    Comment = apps.get_model('comments', 'Comment')
+    Like = apps.get_model('reactions', 'Like')
+
+    counts = Like.objects.filter(comment=OuterRef('pk')).order_by().values('comment').annotate(n=Count('pk')).values('n')
+    Comment.objects.update(like_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+    Comment.objects.update(rank=F('like_count') * 1.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+        ('reactions', '0001_initial'),
+        ('posts', '0007_engagement_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='rank',
+            field=models.FloatField(default=0, help_text='Engagement score, see posts.counters'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-rank'], name='comments_comment_rank_idx'),
+        ),
+        migrations.RunPython(backfill_comment_counters, migrations.RunPython.noop),
+    ]
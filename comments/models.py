@@ -9,6 +9,13 @@ class Comment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    like_count = models.PositiveIntegerField(default=0)
+    rank = models.FloatField(default=0, help_text="Engagement score, see posts.counters")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-rank'], name='comments_comment_rank_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author} on Post #{self.post.id}"
@@ -1,8 +1,24 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Comment
 from posts.models import Post
+from posts.counters import adjust_post_counters, deleted_with
 from notifications.models import Notification
+from notifications.push import push_notifications
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_post_counters(instance.post_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Post):
+        return
+    adjust_post_counters(instance.post_id, comments=-1)
+
 
 @receiver(post_save, sender=Comment)
 def create_comment_notification(sender, instance, created, **kwargs):
@@ -11,7 +27,7 @@ def create_comment_notification(sender, instance, created, **kwargs):
     post = instance.post
     if instance.author == post.author:
         return 
-    Notification.objects.create(
+    notification = Notification.objects.create(
         user=post.author,
         type='mention',
         content=f'{instance.author.display_name or instance.author.username} commented: {instance.content[:50]}',
@@ -19,3 +35,4 @@ def create_comment_notification(sender, instance, created, **kwargs):
         sender_avatar=instance.author.avatar.url if instance.author.avatar else '',
         sender_name=instance.author.display_name or instance.author.username,
     )
+    transaction.on_commit(lambda: push_notifications([notification]))
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Count
-from .models import Conversation, Message, MessageReaction, MessageAttachment
+from .models import Conversation, Message, MessageReaction, MessageAttachment, OutboxEvent
 
 
 @admin.register(Conversation)
@@ -77,7 +77,6 @@ class MessageAdmin(admin.ModelAdmin):
     search_fields = ('sender__username', 'sender__handle', 'content', 'conversation__group_name')
     readonly_fields = ('created_at', 'edited_at', 'read_at', 'message_preview', 'sender_info')
     date_hierarchy = 'created_at'
-    filter_horizontal = ('read_by_users',)
     
     fieldsets = (
         ('Message Information', {
@@ -88,7 +87,7 @@ class MessageAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Read Status', {
-            'fields': ('read_by_users', 'read_at'),
+            'fields': ('read_at',),
             'classes': ('collapse',)
         }),
         ('Metadata', {
@@ -144,7 +143,9 @@ class MessageAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Content'
     
     def read_status(self, obj):
-        read_count = obj.read_by_users.count()
+        read_count = obj.conversation.members.exclude(user_id=obj.sender_id).filter(
+            last_read_message_id__gte=obj.pk
+        ).count()
         if read_count > 0:
             return format_html('✓ Read by {}', read_count)
         return '✗ Unread'
@@ -298,3 +299,11 @@ class MessageAttachmentAdmin(admin.ModelAdmin):
         )
     message_info.short_description = 'Message Information'
 
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'key', 'status', 'attempts', 'next_attempt_at', 'created_at', 'updated_at')
+    list_filter = ('status', 'topic')
+    search_fields = ('key', 'error')
+    readonly_fields = ('topic', 'key', 'payload', 'attempts', 'error', 'next_attempt_at', 'created_at', 'updated_at')
@@ -1,219 +1,238 @@
 import json
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
+from notifications.push import notification_snapshot
+from . import membership, presence, protocol
+from .events import changes_since
 from .models import Conversation, Message
-from .serializers import MessageSerializer
-
-User = get_user_model()
+from .realtime import mark_msgpack, send_to_conversation_async, user_group
+from .receipts import ReadReceiptBuffer
+from .typing import TypingTracker
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
-        self.conversation_group_name = f"chat_{self.conversation_id}"
-        self.user = self.scope["user"]
+class UserConsumer(AsyncWebsocketConsumer):
+    """The one WebSocket a client keeps open.
 
-        print(f"ChatConsumer.connect user={self.user} conversation={self.conversation_id}")
+    The socket joins the user's ``user_<id>`` group, through which every
+    conversation event and every status change addressed to the user arrives.
+    Clients send ``subscribe``/``unsubscribe`` frames for the conversations
+    they have open; conversation-scoped ephemeral events (typing) are only
+    forwarded for subscribed conversations, and frames acting on a
+    conversation are only accepted once it is subscribed.
 
-        await self.channel_layer.group_add(self.conversation_group_name, self.channel_name)
-        await self.accept()
+    Frames are JSON text unless the client negotiated the MessagePack
+    subprotocol (see ``protocol``).
+    """
 
-        if self.user.is_authenticated:
-            await self.set_user_status("online")
-            await self.mark_conversation_read()
-            await self._broadcast_status("online")
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.subscriptions = set()
+        # conversation_id -> bool, dropped on membership_changed events.
+        self.memberships = {}
+        self.typing = TypingTracker(self.publish_typing)
+        self.receipts = ReadReceiptBuffer(self.flush_read)
+        subprotocol, self.codec = protocol.negotiate(self.scope.get("subprotocols"))
+        self.group_name = user_group(self.user.id)
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept(subprotocol)
+
+        await database_sync_to_async(presence.user_connected)(self.user)
+        if self.codec == protocol.MSGPACK:
+            await database_sync_to_async(mark_msgpack)(self.user.id)
+        await self.send_event(await database_sync_to_async(notification_snapshot)(self.user.id))
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.conversation_group_name, self.channel_name)
+        if not getattr(self, "group_name", None):
+            return
 
-        if getattr(self, "user", None) and self.user.is_authenticated:
-            await self.set_user_status("offline")
-            await self._broadcast_status("offline")
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-        print(f"ChatConsumer.disconnect user={self.user} conversation={self.conversation_id} code={close_code}")
+        await self.typing.stop_all()
+        await self.receipts.close()
+        await database_sync_to_async(presence.stop_viewing)(self.user.id, self.subscriptions)
+        await database_sync_to_async(presence.user_disconnected)(self.user)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data)
-            message_type = data.get("type")
-
-            if message_type == "chat_message":
-                message = await self.save_message(data)
-                if message:
-                    await self.channel_layer.group_send(
-                        self.conversation_group_name,
-                        {"type": "chat_message", "message": MessageSerializer(message).data},
-                    )
-
-            elif message_type == "typing":
-                await self.channel_layer.group_send(
-                    self.conversation_group_name,
-                    {
-                        "type": "typing_indicator",
-                        "user_id": self.user.id,
-                        "username": self.user.display_name,
-                        "is_typing": data.get("is_typing", True),
-                    },
-                )
-
-            elif message_type == "message_read":
-                message_id = data.get("message_id")
-                await self.mark_message_read(message_id)
-                await self.channel_layer.group_send(
-                    self.conversation_group_name,
-                    {"type": "message_read_indicator", "message_id": message_id, "user_id": self.user.id},
-                )
-
-            elif message_type == "message_edited":
-                message_id = data.get("message_id")
-                message = await self.get_message(message_id)
-                if message and message.sender == self.user:
-                    await self.channel_layer.group_send(
-                        self.conversation_group_name,
-                        {"type": "message_edited", "message": MessageSerializer(message).data},
-                    )
-
-            elif message_type == "message_deleted":
-                message_id = data.get("message_id")
-                message = await self.get_message(message_id)
-                if message and message.sender == self.user:
-                    await self.channel_layer.group_send(
-                        self.conversation_group_name,
-                        {"type": "message_deleted", "message_id": message_id},
-                    )
-
-            elif message_type == "status_change":
-                new_status = data.get("status", "online")
-                if new_status in ["online", "dnd", "inactive", "offline"]:
-                    await self.set_user_status(new_status)
-                    await self._broadcast_status(new_status)
-
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({"type": "error", "message": "Invalid JSON"}))
-
-    async def _broadcast_status(self, status: str):
-        event = {
-            "type": "user_status_changed",
-            "user_id": self.user.id,
-            "username": self.user.username,
-            "status": status,
-        }
+            data = protocol.loads(self.codec, text_data, bytes_data)
+        except ValueError:
+            await self.send_event({"type": "error", "message": "Invalid frame"})
+            return
 
-        await self.channel_layer.group_send(self.conversation_group_name, event)
-        await self.channel_layer.group_send("presence", event)
+        message_type = data.get("type")
 
-    async def chat_message(self, event):
-        await self.send(text_data=json.dumps({"type": "chat_message", "message": event["message"]}))
+        if message_type == "heartbeat":
+            await database_sync_to_async(presence.heartbeat)(self.user.id, self.subscriptions)
+            if self.codec == protocol.MSGPACK:
+                await database_sync_to_async(mark_msgpack)(self.user.id)
+            return
 
-    async def typing_indicator(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "typing_indicator",
-                    "user_id": event["user_id"],
-                    "username": event["username"],
-                    "is_typing": event["is_typing"],
-                }
-            )
-        )
+        if message_type == "status_change":
+            new_status = data.get("status", "online")
+            if new_status in presence.STATUSES:
+                await database_sync_to_async(presence.set_status)(self.user, new_status)
+            return
 
-    async def message_read_indicator(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {"type": "message_read_indicator", "message_id": event["message_id"], "user_id": event["user_id"]}
+        try:
+            conversation_id = int(data.get("conversation_id"))
+        except (TypeError, ValueError):
+            await self.send_event({"type": "error", "message": "conversation_id is required"})
+            return
+
+        if message_type == "subscribe":
+            await self.subscribe(conversation_id, data.get("since"))
+            return
+
+        if message_type == "unsubscribe":
+            self.subscriptions.discard(conversation_id)
+            await database_sync_to_async(presence.stop_viewing)(self.user.id, [conversation_id])
+            return
+
+        if conversation_id not in self.subscriptions:
+            await self.send_event(
+                {"type": "error", "message": "Not subscribed", "conversation_id": conversation_id}
             )
-        )
+            return
+
+        if message_type == "chat_message":
+            # Delivery happens through the outbox, like for messages sent over HTTP.
+            if await self.is_member(conversation_id):
+                await self.typing.stop(conversation_id)
+                await self.save_message(conversation_id, data)
+
+        elif message_type == "typing":
+            if data.get("is_typing", True):
+                await self.typing.keystroke(conversation_id)
+            else:
+                await self.typing.stop(conversation_id)
+
+        elif message_type in ("read", "message_read"):
+            # "Read up to message X"; message_read is the older one-message name.
+            try:
+                message_id = int(data.get("up_to") or data.get("message_id"))
+            except (TypeError, ValueError):
+                return
+            self.receipts.add(conversation_id, message_id)
+
+    async def subscribe(self, conversation_id, since=None):
+        if not await self.is_member(conversation_id):
+            await self.send_event(
+                {"type": "error", "message": "Not a participant", "conversation_id": conversation_id}
+            )
+            return
+
+        self.subscriptions.add(conversation_id)
+        await database_sync_to_async(presence.start_viewing)(self.user.id, conversation_id)
+        await self.send_event({"type": "subscribed", "conversation_id": conversation_id})
+
+        if since is not None:
+            try:
+                since = max(int(since), 0)
+            except (TypeError, ValueError):
+                since = 0
+            changes = await self.get_changes(conversation_id, since)
+            await self.send_event({"type": "sync", "conversation_id": conversation_id, **changes})
+
+        await self.mark_conversation_read(conversation_id)
+
+    async def send_event(self, event):
+        await self.send(**protocol.dumps(event, self.codec))
+
+    async def forward(self, event):
+        # Frames are encoded once by the publisher, see realtime.encode().
+        if self.codec == protocol.MSGPACK:
+            packed = event.get("packed")
+            if packed is None:
+                packed = protocol.pack(json.loads(event["frame"]))
+            await self.send(bytes_data=packed)
+        else:
+            await self.send(text_data=event["frame"])
+
+    chat_message = forward
+    message_updated = forward
+    message_edited = forward
+    message_deleted = forward
+    message_read_indicator = forward
+    user_status_changed = forward
+    notification = forward
+
+    async def publish_typing(self, conversation_id, is_typing):
+        member_ids = await database_sync_to_async(membership.member_ids)(conversation_id)
+        await send_to_conversation_async(conversation_id, {
+            "type": "typing_indicator",
+            "user_id": self.user.id,
+            "username": self.user.display_name,
+            "is_typing": is_typing,
+        }, member_ids=[user_id for user_id in member_ids if user_id != self.user.id])
+
+    async def flush_read(self, conversation_id, message_id):
+        up_to = await self.mark_read_up_to(conversation_id, message_id)
+        if up_to:
+            await send_to_conversation_async(conversation_id, {
+                "type": "message_read_indicator",
+                "message_id": up_to,
+                "user_id": self.user.id,
+            })
 
-    async def message_edited(self, event):
-        await self.send(text_data=json.dumps({"type": "message_edited", "message": event["message"]}))
-
-    async def message_deleted(self, event):
-        await self.send(text_data=json.dumps({"type": "message_deleted", "message_id": event["message_id"]}))
-
-    async def user_status_changed(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "user_status_changed",
-                    "user_id": event["user_id"],
-                    "username": event["username"],
-                    "status": event["status"],
-                }
+    async def typing_indicator(self, event):
+        if event["conversation_id"] in self.subscriptions:
+            await self.forward(event)
+
+    async def membership_changed(self, event):
+        conversation_id = event["conversation_id"]
+        self.memberships.pop(conversation_id, None)
+        if conversation_id in self.subscriptions and not await self.is_member(conversation_id):
+            self.subscriptions.discard(conversation_id)
+            await database_sync_to_async(presence.stop_viewing)(self.user.id, [conversation_id])
+        await self.forward(event)
+
+    async def is_member(self, conversation_id):
+        if conversation_id not in self.memberships:
+            self.memberships[conversation_id] = await database_sync_to_async(membership.is_member)(
+                conversation_id, self.user.id
             )
-        )
+        return self.memberships[conversation_id]
 
     @database_sync_to_async
-    def save_message(self, data):
+    def save_message(self, conversation_id, data):
         try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            if self.user not in conversation.participants.all():
-                return None
-
-            message_type = data.get("message_type", "text")
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=self.user,
-                message_type=message_type,
-                content=data.get("content", ""),
-            )
-            message.read_by_users.add(self.user)
-            return message
+            conversation = Conversation.objects.get(id=conversation_id)
         except Conversation.DoesNotExist:
             return None
 
-    @database_sync_to_async
-    def mark_message_read(self, message_id):
-        try:
-            message = Message.objects.get(id=message_id)
-            if self.user not in message.read_by_users.all():
-                message.read_by_users.add(self.user)
-        except Message.DoesNotExist:
-            pass
-
-    @database_sync_to_async
-    def mark_conversation_read(self):
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            conversation.mark_as_read(self.user)
-        except Conversation.DoesNotExist:
-            pass
+        message = Message.objects.create(
+            conversation=conversation,
+            sender=self.user,
+            message_type=data.get("message_type", "text"),
+            content=data.get("content", ""),
+        )
+        conversation.mark_as_read(self.user, message.pk)
+        return message
 
     @database_sync_to_async
-    def get_message(self, message_id):
-        try:
-            return Message.objects.get(id=message_id)
-        except Message.DoesNotExist:
+    def mark_read_up_to(self, conversation_id, message_id):
+        """Move the watermark; returns the message ID it moved to, or None."""
+        conversation = Conversation.objects.only("id", "last_message_id").filter(pk=conversation_id).first()
+        if conversation is None or not conversation.last_message_id:
             return None
+        up_to = min(message_id, conversation.last_message_id)
+        return up_to if conversation.mark_as_read(self.user, up_to) else None
 
     @database_sync_to_async
-    def set_user_status(self, status):
+    def mark_conversation_read(self, conversation_id):
         try:
-            user = User.objects.get(id=self.user.id)
-            user.status = status
-            user.save(update_fields=["status"])
-            return True
-        except User.DoesNotExist:
-            return False
-
-
-class PresenceConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.user = self.scope.get("user")
-        await self.channel_layer.group_add("presence", self.channel_name)
-        await self.accept()
+            conversation = Conversation.objects.get(id=conversation_id)
+        except Conversation.DoesNotExist:
+            return
+        conversation.mark_as_read(self.user)
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("presence", self.channel_name)
-
-    async def user_status_changed(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "type": "user_status_changed",
-                    "user_id": event.get("user_id"),
-                    "username": event.get("username"),
-                    "status": event.get("status"),
-                }
-            )
-        )
\ No newline at end of file
+    @database_sync_to_async
+    def get_changes(self, conversation_id, since):
+        conversation = Conversation.objects.get(id=conversation_id)
+        return changes_since(conversation, since)
@@ -0,0 +1,41 @@
+"""Conversation list ("inbox") for the messenger.
+
+The whole inbox is loaded in a constant number of queries: conversations
+with their denormalized ``last_message`` (joined) and an unread count
+derived from the member's read watermark, plus one prefetch each for
+participants, members and the last message's reactions and attachments.
+Nothing here depends on how many messages a conversation holds.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Conversation, Message, MessageReaction
+
+
+def unread_count_subquery(user):
+    """Messages from others above the member's read watermark (``last_read`` annotation)."""
+    unread = (
+        Message.objects.filter(conversation=OuterRef('pk'), id__gt=OuterRef('last_read'))
+        .exclude(sender=user)
+        .order_by()
+        .values('conversation')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+
+
+def inbox_queryset(user):
+    return (
+        Conversation.objects.filter(members__user=user)
+        .annotate(last_read=F('members__last_read_message_id'))
+        .select_related('last_message__sender')
+        .prefetch_related(
+            'participants',
+            'members',
+            Prefetch('last_message__reactions', queryset=MessageReaction.objects.select_related('user')),
+            'last_message__attachments',
+        )
+        .annotate(unread_count=unread_count_subquery(user))
+        .order_by(F('last_message_at').desc(nulls_last=True), '-id')
+    )
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from messaging.consumers import UserConsumer
+from messaging import protocol
+from messaging.models import Message
+from messaging.realtime import encode
+from messaging.serializers import MessageSerializer
+
+
+class Command(BaseCommand):
+    help = 'Measure the CPU and bytes per recipient of delivering a chat message to a large group'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=200, help='Recipients per event (default: 200)')
+        parser.add_argument('--events', type=int, default=200, help='Events to deliver (default: 200)')
+
+    def handle(self, *args, **options):
+        members, events = options['members'], options['events']
+
+        message = Message.objects.select_related('sender').prefetch_related('attachments').order_by('-id').first()
+        if message is None:
+            raise CommandError('Needs at least one message to serialize')
+        payload = MessageSerializer(message).data
+
+        self.stdout.write(f'{members} members, {events} events')
+        runs = (
+            ('per-recipient', self._per_recipient, protocol.JSON),
+            ('encode-once', self._encode_once, protocol.JSON),
+            ('msgpack', self._encode_once, protocol.MSGPACK),
+        )
+        for name, deliver, codec in runs:
+            started = time.process_time()
+            sent = asyncio.run(deliver(message.conversation_id, payload, members, events, codec))
+            elapsed = (time.process_time() - started) / (members * events) * 1_000_000
+            self.stdout.write(self.style.SUCCESS(f'{name:>14}: {elapsed:8.2f} us CPU/recipient ({sent} bytes sent)'))
+
+    def _consumers(self, members, codec):
+        sent = [0]
+
+        async def base_send(message):
+            sent[0] += len(message.get('text') or message.get('bytes') or '')
+
+        consumers = []
+        for _ in range(members):
+            consumer = UserConsumer()
+            consumer.codec = codec
+            consumer.base_send = base_send
+            consumers.append(consumer)
+        return consumers, sent
+
+    async def _per_recipient(self, conversation_id, payload, members, events, codec):
+        # What the consumers did before: every recipient rebuilt the event
+        # and encoded its own copy.
+        consumers, sent = self._consumers(members, codec)
+        for seq in range(events):
+            event = {'type': 'chat_message', 'message': payload, 'seq': seq, 'conversation_id': conversation_id}
+            for consumer in consumers:
+                await consumer.send(text_data=json.dumps({
+                    'type': 'chat_message',
+                    'message': event['message'],
+                    'seq': event['seq'],
+                    'conversation_id': event['conversation_id'],
+                }))
+        return sent[0]
+
+    async def _encode_once(self, conversation_id, payload, members, events, codec):
+        consumers, sent = self._consumers(members, codec)
+        for seq in range(events):
+            event = encode(
+                {'type': 'chat_message', 'message': payload, 'seq': seq, 'conversation_id': conversation_id},
+                packed=codec == protocol.MSGPACK,
+            )
+            for consumer in consumers:
+                await consumer.chat_message(event)
+        return sent[0]
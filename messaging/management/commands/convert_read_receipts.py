@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from messaging.models import Conversation, ConversationMember, Message
+
+
+class Command(BaseCommand):
+    help = 'Convert per-message read_by_users rows into per-member read watermarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Conversations converted per statement (default: 1000)',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the read_by_users rows of each batch once it is converted',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ReadBy = Message.read_by_users.through
+
+        max_id = Conversation.objects.aggregate(m=Max('id'))['m'] or 0
+        converted = deleted = 0
+
+        for start in range(0, max_id + 1, batch_size):
+            in_batch = {'conversation_id__gte': start, 'conversation_id__lt': start + batch_size}
+
+            last_read = (
+                ReadBy.objects.filter(
+                    message__conversation_id=OuterRef('conversation_id'),
+                    user_id=OuterRef('user_id'),
+                )
+                .order_by()
+                .values('user_id')
+                .annotate(last=Max('message_id'))
+                .values('last')
+            )
+            converted += ConversationMember.objects.filter(**in_batch).update(
+                last_read_message_id=Greatest(
+                    F('last_read_message_id'), Coalesce(Subquery(last_read), Value(0))
+                )
+            )
+
+            if options['delete']:
+                deleted += ReadBy.objects.filter(
+                    message__conversation_id__gte=start,
+                    message__conversation_id__lt=start + batch_size,
+                ).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Converted read state for {converted} conversation members'))
+        if options['delete']:
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} read_by_users rows'))
@@ -52,10 +52,9 @@ class Command(BaseCommand):
                     content=msg_text
                 )
 
+                conversation.mark_as_read(sender, message.pk)
                 if i % 2 == 1:
-                    message.read_by_users.add(user1, user2)
-                else:
-                    message.read_by_users.add(sender)
+                    conversation.mark_as_read(user1, message.pk)
             
             self.stdout.write(self.style.SUCCESS('Created test messages'))
         
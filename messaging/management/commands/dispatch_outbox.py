@@ -0,0 +1,49 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from messaging.outbox import purge_dispatched, run_dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Publish pending outbox events (WebSocket delivery, notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per round (default: 100)')
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.2,
+            help='Seconds to sleep when the outbox is empty',
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=60,
+            help='Reclaim events stuck in processing for this many seconds',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the outbox is empty instead of polling',
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            default=None,
+            help='Only delete dispatched events older than this many days, then exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            deleted = purge_dispatched(options['purge_days'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} dispatched outbox events'))
+            return
+
+        self.stdout.write('Outbox dispatcher started')
+        asyncio.run(run_dispatcher(
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            stale_after=options['stale_after'],
+            once=options['once'],
+        ))
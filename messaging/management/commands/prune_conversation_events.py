@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from messaging.events import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Delete conversation sync events older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep this many days of events (default: MESSAGING_EVENT_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_events(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} conversation events'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from messaging.presence import sweep
+
+
+class Command(BaseCommand):
+    help = 'Mark users offline whose presence heartbeat has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and sweep every N seconds (default: run once)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            swept = sweep()
+            if swept:
+                self.stdout.write(self.style.SUCCESS(f'Marked {swept} users offline'))
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,37 @@
+"""Who is in a conversation.
+
+``ConversationMember`` mirrors ``Conversation.participants`` and is indexed
+on ``(conversation, user)``, so authorization is a single EXISTS lookup
+instead of loading every participant. Member lists used for delivery are
+cached and dropped by ``invalidate()`` whenever participants change; the
+same change is pushed to the affected users' sockets, which keep their own
+per-connection membership cache.
+"""
+from django.core.cache import cache
+
+from .models import ConversationMember
+
+MEMBERS_TTL = 10 * 60
+
+
+def _members_key(conversation_id):
+    return f"conversation:members:{conversation_id}"
+
+
+def is_member(conversation_id, user_id):
+    return ConversationMember.objects.filter(conversation_id=conversation_id, user_id=user_id).exists()
+
+
+def member_ids(conversation_id):
+    """IDs of the members of ``conversation_id``, cached."""
+    ids = cache.get(_members_key(conversation_id))
+    if ids is None:
+        ids = list(
+            ConversationMember.objects.filter(conversation_id=conversation_id).values_list("user_id", flat=True)
+        )
+        cache.set(_members_key(conversation_id), ids, MEMBERS_TTL)
+    return ids
+
+
+def invalidate(conversation_ids):
+    cache.delete_many([_members_key(conversation_id) for conversation_id in conversation_ids])
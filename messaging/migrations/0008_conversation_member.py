@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 23:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_members(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationMember = apps.get_model('messaging', 'ConversationMember')
+    Participant = Conversation.participants.through
+
+    batch = []
+    for conversation_id, user_id in Participant.objects.values_list('conversation_id', 'user_id').iterator():
+        batch.append(ConversationMember(conversation_id=conversation_id, user_id=user_id))
+        if len(batch) >= 5000:
+            ConversationMember.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ConversationMember.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0007_conversation_last_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.PositiveBigIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='messaging.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'conversation'], name='messaging_member_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'user'), name='messaging_member_uniq')],
+            },
+        ),
+        migrations.RunPython(create_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-17 23:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0008_conversation_member'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='event_seq',
+            field=models.PositiveBigIntegerField(default=0, help_text='Sequence number of the latest ConversationEvent'),
+        ),
+        migrations.CreateModel(
+            name='ConversationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(choices=[('message.created', 'Message created'), ('message.edited', 'Message edited'), ('message.deleted', 'Message deleted'), ('reaction', 'Reaction changed'), ('read', 'Read watermark moved')], max_length=20)),
+                ('message_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('user_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('conversation', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='messaging.conversation')),
+            ],
+            options={
+                'ordering': ['conversation', 'seq'],
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'seq'), name='messaging_event_seq_uniq')],
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from PIL import Image
@@ -6,6 +6,7 @@ from io import BytesIO
 import mimetypes
 import logging
 
+from attachments.processing import enqueue_media_job
 from social_core.storages import (
     ImageCloudinaryStorage,
     ChatVideoCloudinaryStorage,
@@ -28,12 +29,22 @@ class Conversation(models.Model):
     is_group = models.BooleanField(default=False, db_index=True)
     group_name = models.CharField(max_length=255, blank=True, null=True)
     group_avatar = models.ImageField(upload_to='conversation_avatars/', blank=True, null=True)
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    event_seq = models.PositiveBigIntegerField(default=0, help_text="Sequence number of the latest ConversationEvent")
 
     class Meta:
         ordering = ['-updated_at']
         indexes = [
             models.Index(fields=['is_group', '-updated_at']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['-last_message_at'], name='messaging_conv_last_msg_idx'),
         ]
 
     def __str__(self):
@@ -47,13 +58,124 @@ class Conversation(models.Model):
             return self.participants.exclude(pk=user.pk).first()
         return None
 
-    def mark_as_read(self, user):
-        self.messages.filter(read_by_users__isnull=True).exclude(sender=user).update(
-            read_at=timezone.now()
+    def refresh_last_message(self):
+        last = self.messages.order_by('-created_at', '-id').first()
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message=last,
+            last_message_at=last.created_at if last else None
         )
-        for message in self.messages.exclude(sender=user):
-            if user not in message.read_by_users.all():
-                message.read_by_users.add(user)
+
+    def mark_as_read(self, user, message_id=None):
+        """Move ``user``'s read watermark up to ``message_id`` (default: the latest message)."""
+        message_id = message_id or self.last_message_id
+        if not message_id:
+            return 0
+        # Read state is not logged as events: sync returns the watermarks
+        # themselves, so a receipt stays one UPDATE of the member row.
+        return ConversationMember.objects.filter(
+            conversation=self, user=user, last_read_message_id__lt=message_id
+        ).update(last_read_message_id=message_id, last_read_at=timezone.now())
+
+    def read_watermarks(self):
+        """``{user_id: last_read_message_id}`` for every member."""
+        return dict(self.members.values_list('user_id', 'last_read_message_id'))
+
+
+class ConversationMember(models.Model):
+    """A participant's read state: every message up to ``last_read_message_id`` has been read."""
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+    last_read_at = models.DateTimeField(blank=True, null=True)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='messaging_member_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'conversation'], name='messaging_member_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in {self.conversation_id} (read up to {self.last_read_message_id})"
+
+
+class ConversationEvent(models.Model):
+    """One change in a conversation, numbered by a per-conversation sequence for delta sync."""
+
+    MESSAGE_CREATED = 'message.created'
+    MESSAGE_EDITED = 'message.edited'
+    MESSAGE_DELETED = 'message.deleted'
+    REACTION = 'reaction'
+    READ = 'read'
+    KIND_CHOICES = [
+        (MESSAGE_CREATED, 'Message created'),
+        (MESSAGE_EDITED, 'Message edited'),
+        (MESSAGE_DELETED, 'Message deleted'),
+        (REACTION, 'Reaction changed'),
+        (READ, 'Read watermark moved'),
+    ]
+
+    # No database constraint: events of a conversation that is being deleted
+    # are still written while its messages cascade, and pruned later.
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='events'
+    )
+    seq = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    message_id = models.PositiveBigIntegerField(blank=True, null=True)
+    user_id = models.PositiveBigIntegerField(blank=True, null=True)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['conversation', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'seq'], name='messaging_event_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.kind} in {self.conversation_id}"
+
+
+class OutboxEvent(models.Model):
+    """A side effect of a message write, committed with it and dispatched later.
+
+    ``key`` is an idempotency key: enqueueing the same effect twice (a retried
+    request or transaction) yields one row, so it is published once.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=50)
+    key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Failed events wait before they are claimed again; see outbox.retry_delay().
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='messaging_outbox_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
 
 
 class Message(models.Model):
@@ -130,6 +252,7 @@ class Message(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     read_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Superseded by ConversationMember watermarks; kept until convert_read_receipts has run.
     read_by_users = models.ManyToManyField(User, related_name='read_messages', blank=True)
     
     is_edited = models.BooleanField(default=False)
@@ -148,10 +271,8 @@ class Message(models.Model):
         return f"Message from {self.sender.display_name} - {self.created_at}"
 
     def mark_as_read(self, user):
-        if user not in self.read_by_users.all() and user != self.sender:
-            self.read_by_users.add(user)
-            self.read_at = timezone.now()
-            self.save(update_fields=['read_at'])
+        if user != self.sender:
+            self.conversation.mark_as_read(user, self.pk)
 
     def mark_as_delivered(self):
         pass
@@ -161,6 +282,7 @@ class Message(models.Model):
             try:
                 img = Image.open(self.image)
                 img.thumbnail((200, 200), Image.Resampling.LANCZOS)
+                img = img.convert('RGB')
                 
                 thumb_io = BytesIO()
                 img.save(thumb_io, format='JPEG', quality=80)
@@ -169,7 +291,7 @@ class Message(models.Model):
                 thumb_name = f"thumb_{self.image.name.split('/')[-1]}"
                 self.image_thumbnail.save(thumb_name, thumb_io, save=False)
             except Exception as e:
-                print(f"Error generating image thumbnail: {e}")
+                logger.warning(f"Error generating image thumbnail: {e}", exc_info=True)
 
     def generate_video_thumbnail(self):
         if self.video and not self.video_thumbnail:
@@ -181,22 +303,55 @@ class Message(models.Model):
             thumb_name = f"thumb_{self.video.name.split('/')[-1]}.jpg"
             self.video_thumbnail.save(thumb_name, thumb_io, save=False)
 
+    def needs_media_processing(self):
+        if self.message_type == 'image':
+            return bool(self.image) and not self.image_thumbnail
+        if self.message_type == 'video':
+            return bool(self.video) and not self.video_thumbnail
+        return False
+
+    def process_media(self):
+        if self.message_type == 'image' and self.image and not self.image_thumbnail:
+            self.generate_image_thumbnail()
+            if not self.image_thumbnail:
+                raise ValueError(f"Could not build a thumbnail for message {self.pk}")
+            Message.objects.filter(pk=self.pk).update(image_thumbnail=self.image_thumbnail.name)
+        elif self.message_type == 'video' and self.video and not self.video_thumbnail:
+            self.generate_video_thumbnail()
+            Message.objects.filter(pk=self.pk).update(video_thumbnail=self.video_thumbnail.name)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_content = instance.__dict__.get('content')
+        return instance
+
+    def content_changed(self, update_fields=None):
+        """Whether the pending save changes ``content``, as far as can be told."""
+        if update_fields is not None and 'content' not in update_fields:
+            return False
+        if getattr(self, '_loaded_content', None) is None:
+            return update_fields is not None
+        return self._loaded_content != self.content
+
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-
-        if is_new:
-            if self.message_type == 'image' and self.image:
-                try:
-                    self.generate_image_thumbnail()
-                except Exception as e:
-                    logger.warning(f"Failed to generate image thumbnail: {e}", exc_info=True)
-            elif self.message_type == 'video' and self.video:
-                try:
-                    self.generate_video_thumbnail()
-                except Exception as e:
-                    logger.warning(f"Failed to generate video thumbnail: {e}", exc_info=True)
+        created = self._state.adding
+        # post_save receivers write the sync event and the outbox row; they
+        # must commit or roll back together with the message.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._loaded_content = self.content
 
-        super().save(*args, **kwargs)
+            if created:
+                Conversation.objects.filter(pk=self.conversation_id).update(
+                    last_message=self,
+                    last_message_at=self.created_at
+                )
+
+        update_fields = kwargs.get('update_fields')
+        media_touched = update_fields is None or {'image', 'video'} & set(update_fields)
+        if media_touched and self.needs_media_processing():
+            enqueue_media_job(self)
 
 
 class MessageReaction(models.Model):
@@ -270,21 +425,21 @@ class MessageAttachment(models.Model):
         elif self.attachment_type == 'video':
             self.file.field.storage = ChatVideoCloudinaryStorage()
         
-        is_new = self.pk is None
         super().save(*args, **kwargs)
-        
-        if is_new and self.attachment_type == 'image':
-            try:
-                self.generate_thumbnail()
-                self.save(update_fields=['thumbnail'])
-            except Exception as e:
-                logger.warning(f"Error generating attachment thumbnail: {e}", exc_info=True)
-        elif is_new and self.attachment_type == 'video':
-            try:
-                self.generate_video_thumbnail()
-                self.save(update_fields=['thumbnail'])
-            except Exception as e:
-                logger.warning(f"Error generating video attachment thumbnail: {e}", exc_info=True)
+
+        if self.file and not self.thumbnail:
+            enqueue_media_job(self)
+
+    def process_media(self):
+        if self.thumbnail:
+            return
+        if self.attachment_type == 'image':
+            self.generate_thumbnail()
+        elif self.attachment_type == 'video':
+            self.generate_video_thumbnail()
+        if not self.thumbnail:
+            raise ValueError(f"Could not build a thumbnail for attachment {self.pk}")
+        MessageAttachment.objects.filter(pk=self.pk).update(thumbnail=self.thumbnail.name)
 
     def generate_thumbnail(self):
         if self.file and self.attachment_type == 'image':
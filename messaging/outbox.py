@@ -0,0 +1,195 @@
+"""Transactional outbox for the side effects of message writes.
+
+Sending, editing or deleting a message only inserts an ``OutboxEvent`` in
+the same transaction as the write; WebSocket delivery and notification rows
+are produced afterwards by the ``dispatch_outbox`` worker, so request latency
+no longer includes channel layer round trips or notification fan-out, and
+nothing is published for a write that rolled back.
+
+Events are claimed like media jobs (``select_for_update(skip_locked=True)``)
+and retried up to ``MAX_ATTEMPTS`` times, each retry waiting longer than the
+last. Every event carries a single side effect, so a failing notification
+write never re-sends a chat frame that was already delivered. Handlers must
+still be idempotent: an event whose handler ran but whose ``done`` update
+was lost is run again.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ConversationEvent, Message, OutboxEvent
+from .realtime import send_to_conversation_async
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 15 * 60
+
+# Creation notifications are a separate event from the chat frame.
+MESSAGE_NOTIFY = 'message.notify'
+
+
+def enqueue(topic, key, payload):
+    """Add an event unless one with the same idempotency ``key`` exists."""
+    try:
+        with transaction.atomic():
+            return OutboxEvent.objects.create(topic=topic, key=key, payload=payload)
+    except IntegrityError:
+        return None
+
+
+def claim_events(limit, stale_after=60):
+    """Mark up to ``limit`` runnable events as processing and return them in order."""
+    now = timezone.now()
+    runnable = (
+        Q(status='pending', next_attempt_at__lte=now)
+        | Q(status='processing', updated_at__lt=now - timedelta(seconds=stale_after))
+    )
+
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(runnable)
+            .order_by('id')[:limit]
+        )
+        if events:
+            OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(
+                status='processing',
+                attempts=F('attempts') + 1,
+                updated_at=now,
+            )
+    return events
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try of an event that failed ``attempts`` times."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def finish_event(event_id, error=None, attempts=0):
+    """Record the outcome of a run; ``attempts`` is the count before it was claimed."""
+    if error is None:
+        OutboxEvent.objects.filter(pk=event_id).update(status='done', error='')
+        return
+    attempts += 1
+    if attempts >= MAX_ATTEMPTS:
+        OutboxEvent.objects.filter(pk=event_id).update(status='failed', error=error)
+    else:
+        OutboxEvent.objects.filter(pk=event_id).update(
+            status='pending',
+            error=error,
+            next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+        )
+
+
+def purge_dispatched(days=7):
+    deleted, _ = OutboxEvent.objects.filter(
+        status='done', updated_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def _load_message(message_id, watermarks=None):
+    """The message and its serialized form; ``watermarks`` spares the read state query."""
+    from .serializers import MessageSerializer
+
+    message = (
+        Message.objects.select_related('sender')
+        .prefetch_related('reactions__user', 'attachments')
+        .filter(pk=message_id)
+        .first()
+    )
+    if message is None:
+        return None, None
+    context = {}
+    if watermarks is not None:
+        context['read_watermarks'] = {message.conversation_id: watermarks}
+    return message, MessageSerializer(message, context=context).data
+
+
+async def _message_created(payload):
+    # Nobody but the sender can have read a message that is only now being
+    # delivered, so its read count is known to be zero.
+    message, data = await database_sync_to_async(_load_message)(payload['message_id'], watermarks={})
+    if message is None:
+        return
+    await send_to_conversation_async(message.conversation_id, {
+        'type': 'chat_message',
+        'message': data,
+        'seq': payload.get('seq'),
+    })
+
+
+def _notify_message(payload):
+    from notifications.delivery import notify_new_message
+
+    message = Message.objects.select_related('sender').filter(pk=payload['message_id']).first()
+    if message is not None:
+        notify_new_message(message)
+
+
+async def _message_notify(payload):
+    await database_sync_to_async(_notify_message)(payload)
+
+
+async def _message_edited(payload):
+    message, data = await database_sync_to_async(_load_message)(payload['message_id'])
+    if message is None:
+        return
+    await send_to_conversation_async(message.conversation_id, {
+        'type': 'message_edited',
+        'message': data,
+    })
+
+
+async def _message_deleted(payload):
+    await send_to_conversation_async(payload['conversation_id'], {
+        'type': 'message_deleted',
+        'message_id': payload['message_id'],
+    })
+
+
+HANDLERS = {
+    ConversationEvent.MESSAGE_CREATED: _message_created,
+    MESSAGE_NOTIFY: _message_notify,
+    ConversationEvent.MESSAGE_EDITED: _message_edited,
+    ConversationEvent.MESSAGE_DELETED: _message_deleted,
+}
+
+
+async def dispatch_event(event):
+    handler = HANDLERS.get(event.topic)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler for topic {event.topic}')
+        await handler(event.payload)
+    except Exception as e:
+        logger.warning(f"Outbox event {event.key} failed: {e}", exc_info=True)
+        await database_sync_to_async(finish_event)(event.id, str(e), event.attempts)
+        return False
+    await database_sync_to_async(finish_event)(event.id)
+    return True
+
+
+async def dispatch_pending(batch_size=100, stale_after=60):
+    """Dispatch one batch in order. Returns the number of events claimed."""
+    events = await database_sync_to_async(claim_events)(batch_size, stale_after)
+    for event in events:
+        await dispatch_event(event)
+    return len(events)
+
+
+async def run_dispatcher(batch_size=100, poll_interval=0.2, stale_after=60, once=False):
+    while True:
+        claimed = await dispatch_pending(batch_size, stale_after)
+        if claimed:
+            continue
+        if once:
+            return
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,213 @@
+"""Presence: who is connected, and who gets told about it.
+
+Liveness lives in the shared cache, not in the database. Every open socket
+heartbeats ``presence:seen:<id>`` with a ``PRESENCE_TTL`` expiry and
+``presence:conns:<id>`` counts a user's open sockets. When the last socket
+closes the seen key is shortened to ``PRESENCE_OFFLINE_GRACE`` seconds
+instead of being deleted, so a reload or a flaky network reconnects without
+an offline/online round trip. ``presence:viewing:<conversation>:<id>`` marks
+the conversations a user has open, so notifications can skip them.
+``presence:friends:<id>`` caches the online users someone follows; it is
+dropped on follow changes and on every status transition it could reflect.
+
+``User.status`` is only written on transitions: a user coming online, an
+explicit status change, and the ``sweep_presence`` worker marking users
+whose seen key has expired as offline. Status changes are delivered to the
+user's followers and conversation partners only, through their
+``user_<id>`` groups.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Follow
+
+from .models import ConversationMember
+from .realtime import send_to_users
+
+User = get_user_model()
+
+STATUSES = ("online", "dnd", "inactive", "offline")
+BATCH_SIZE = 500
+
+
+def _ttl():
+    return getattr(settings, "PRESENCE_TTL", 90)
+
+
+def _grace():
+    return getattr(settings, "PRESENCE_OFFLINE_GRACE", 15)
+
+
+def _seen_key(user_id):
+    return f"presence:seen:{user_id}"
+
+
+def _conns_key(user_id):
+    return f"presence:conns:{user_id}"
+
+
+def _friends_key(user_id):
+    return f"presence:friends:{user_id}"
+
+
+def _viewing_key(conversation_id, user_id):
+    return f"presence:viewing:{conversation_id}:{user_id}"
+
+
+def is_live(user_id):
+    return cache.get(_seen_key(user_id)) is not None
+
+
+def live_user_ids(user_ids):
+    """The subset of ``user_ids`` with a live connection."""
+    user_ids = list(user_ids)
+    found = cache.get_many([_seen_key(user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _seen_key(user_id) in found}
+
+
+def heartbeat(user_id, conversation_ids=()):
+    cache.set(_seen_key(user_id), timezone.now().timestamp(), _ttl())
+    cache.touch(_conns_key(user_id), _ttl())
+    if conversation_ids:
+        cache.set_many({_viewing_key(conversation_id, user_id): True for conversation_id in conversation_ids}, _ttl())
+
+
+def start_viewing(user_id, conversation_id):
+    """Record that ``user_id`` has ``conversation_id`` open on a live socket."""
+    cache.set(_viewing_key(conversation_id, user_id), True, _ttl())
+
+
+def stop_viewing(user_id, conversation_ids):
+    cache.delete_many([_viewing_key(conversation_id, user_id) for conversation_id in conversation_ids])
+
+
+def viewer_ids(conversation_id, user_ids):
+    """The subset of ``user_ids`` that currently has ``conversation_id`` open."""
+    user_ids = list(user_ids)
+    found = cache.get_many([_viewing_key(conversation_id, user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _viewing_key(conversation_id, user_id) in found}
+
+
+def audience(user_id):
+    """IDs of the users who see ``user_id``'s status: followers and conversation partners."""
+    followers = Follow.objects.filter(following_id=user_id).values_list("follower_id", flat=True)
+    partners = (
+        ConversationMember.objects.filter(
+            conversation__members__user_id=user_id,
+        )
+        .exclude(user_id=user_id)
+        .values_list("user_id", flat=True)
+    )
+    return set(followers) | set(partners) | {user_id}
+
+
+def broadcast_status(user, status):
+    user_ids = audience(user.id)
+    forget_following(user_ids)
+    send_to_users(live_user_ids(user_ids), {
+        "type": "user_status_changed",
+        "user_id": user.id,
+        "username": user.username,
+        "status": status,
+    })
+
+
+def user_connected(user):
+    """Register a new socket of ``user``; announces them if they were not live."""
+    was_live = is_live(user.id)
+    cache.add(_conns_key(user.id), 0, _ttl())
+    try:
+        cache.incr(_conns_key(user.id))
+    except ValueError:
+        cache.set(_conns_key(user.id), 1, _ttl())
+    heartbeat(user.id)
+
+    if was_live:
+        return
+    if user.status == "offline":
+        previous = getattr(user, "previous_status", "offline")
+        user.status = previous if previous != "offline" else "online"
+        User.objects.filter(pk=user.pk).update(status=user.status)
+    broadcast_status(user, user.status)
+
+
+def user_disconnected(user):
+    """Drop a socket of ``user``; the last one starts the offline grace period."""
+    try:
+        remaining = cache.decr(_conns_key(user.id))
+    except ValueError:
+        remaining = 0
+    if remaining <= 0:
+        cache.delete(_conns_key(user.id))
+        cache.set(_seen_key(user.id), timezone.now().timestamp(), _grace())
+
+
+def set_status(user, status):
+    """Persist an explicitly chosen status and announce it."""
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+    changed = user.status != status
+    user.status = status
+    User.objects.filter(pk=user.pk).update(status=status)
+    if changed:
+        broadcast_status(user, status)
+
+
+def set_offline(user):
+    """Mark ``user`` offline now, remembering the status to restore on next login."""
+    cache.delete_many([_seen_key(user.id), _conns_key(user.id)])
+    if user.status == "offline":
+        return
+    user.previous_status = user.status
+    user.status = "offline"
+    User.objects.filter(pk=user.pk).update(status="offline", previous_status=user.previous_status)
+    broadcast_status(user, "offline")
+
+
+def sweep():
+    """Mark users offline whose heartbeat has expired. Returns how many were."""
+    swept = 0
+    candidates = User.objects.exclude(status="offline").only("id", "username", "status")
+    last_pk = 0
+    while True:
+        batch = list(candidates.filter(pk__gt=last_pk).order_by("pk")[:BATCH_SIZE])
+        if not batch:
+            return swept
+        last_pk = batch[-1].pk
+        live = live_user_ids(user.id for user in batch)
+        expired = [user for user in batch if user.id not in live]
+        if not expired:
+            continue
+        User.objects.filter(pk__in=[user.pk for user in expired]).exclude(status="offline").update(
+            previous_status=F("status"), status="offline"
+        )
+        for user in expired:
+            broadcast_status(user, "offline")
+        swept += len(expired)
+
+
+def online_user_ids(user_ids):
+    """The subset of ``user_ids`` that is live and not appearing offline."""
+    live = live_user_ids(user_ids)
+    if not live:
+        return set()
+    return set(User.objects.filter(pk__in=live).exclude(status="offline").values_list("pk", flat=True))
+
+
+def online_following(user_id):
+    """Online users that ``user_id`` follows, by display name; cached for ``PRESENCE_TTL``."""
+    key = _friends_key(user_id)
+    friends = cache.get(key)
+    if friends is None:
+        following_ids = Follow.objects.filter(follower_id=user_id).values_list("following_id", flat=True)
+        online_ids = online_user_ids(following_ids)
+        friends = list(User.objects.filter(pk__in=online_ids).order_by("display_name")) if online_ids else []
+        cache.set(key, friends, _ttl())
+    return friends
+
+
+def forget_following(user_ids):
+    cache.delete_many([_friends_key(user_id) for user_id in user_ids])
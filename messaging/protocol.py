@@ -0,0 +1,53 @@
+"""Wire formats of the realtime WebSocket.
+
+Clients pick a format with the WebSocket subprotocol handshake. Without a
+subprotocol (the browser client) frames are JSON text; clients offering
+``retronet.msgpack.v1`` get MessagePack binary frames, which are noticeably
+smaller for messages carrying nested user objects and long media URLs.
+
+Published events carry their frame in every format (see
+``realtime.encode``), so a consumer only picks the one its client speaks.
+"""
+import json
+
+import msgpack
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+SUBPROTOCOLS = {
+    "retronet.msgpack.v1": MSGPACK,
+}
+
+
+def negotiate(requested):
+    """Return ``(subprotocol, codec)`` for the subprotocols a client offered."""
+    for subprotocol in requested or ():
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol, SUBPROTOCOLS[subprotocol]
+    return None, JSON
+
+
+def pack(event):
+    return msgpack.packb(event, use_bin_type=True)
+
+
+def dumps(event, codec):
+    """Keyword arguments for ``AsyncWebsocketConsumer.send`` carrying ``event``."""
+    if codec == MSGPACK:
+        return {"bytes_data": pack(event)}
+    return {"text_data": json.dumps(event)}
+
+
+def loads(codec, text_data=None, bytes_data=None):
+    """Decode a client frame; raises ``ValueError`` if it is not a valid object."""
+    try:
+        if codec == MSGPACK and bytes_data is not None:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            data = json.loads(text_data if text_data is not None else bytes_data)
+    except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+        raise ValueError("Malformed frame") from exc
+    if not isinstance(data, dict):
+        raise ValueError("Frame must be an object")
+    return data
@@ -0,0 +1,114 @@
+"""Routing of real-time events to user-scoped WebSocket groups.
+
+Every connected client has one socket (``UserConsumer``) that sits in its
+user's ``user_<id>`` group. Conversation events are delivered by sending
+them to the group of each conversation member; the consumer decides what to
+forward based on the conversations the client subscribed to.
+
+Events are encoded to their wire frames once, when they are published
+(``encode``). The channel layer message carries the JSON frame plus the few
+fields consumers route on, so a consumer forwards the frame instead of
+re-serializing the event for every recipient. The MessagePack frame is only
+added when a recipient has a MessagePack socket (``realtime:msgpack:<id>``,
+set by the consumer and refreshed by its heartbeats); a consumer that gets a
+message without one packs it itself.
+"""
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from . import membership
+from .protocol import pack
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_KEY = "realtime:msgpack:{}"
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def mark_msgpack(user_id):
+    """Record that ``user_id`` has a socket speaking MessagePack, for one presence TTL."""
+    cache.set(MSGPACK_KEY.format(user_id), True, getattr(settings, "PRESENCE_TTL", 90))
+
+
+def uses_msgpack(user_ids):
+    """Whether any of ``user_ids`` has a MessagePack socket."""
+    return bool(cache.get_many([MSGPACK_KEY.format(user_id) for user_id in user_ids]))
+
+
+def encode(event, packed=True):
+    """Channel layer message for ``event`` with its wire frames encoded once."""
+    message = {
+        "type": event["type"],
+        "conversation_id": event.get("conversation_id"),
+        "user_id": event.get("user_id"),
+        "frame": json.dumps(event),
+    }
+    if packed:
+        message["packed"] = pack(event)
+    return message
+
+
+def _recipients(conversation_id, member_ids):
+    if member_ids is None:
+        member_ids = membership.member_ids(conversation_id)
+    return member_ids, uses_msgpack(member_ids)
+
+
+async def send_to_conversation_async(conversation_id, event, member_ids=None):
+    channel_layer = get_channel_layer()
+    member_ids, packed = await database_sync_to_async(_recipients)(conversation_id, member_ids)
+    message = encode({**event, "conversation_id": conversation_id}, packed)
+    for user_id in member_ids:
+        await channel_layer.group_send(user_group(user_id), message)
+
+
+def send_to_users(user_ids, event):
+    """Deliver ``event`` to the sockets of ``user_ids``; failures are logged, not raised."""
+    user_ids = list(user_ids)
+    message = encode(event, uses_msgpack(user_ids))
+
+    async def send():
+        channel_layer = get_channel_layer()
+        for user_id in user_ids:
+            await channel_layer.group_send(user_group(user_id), message)
+
+    try:
+        async_to_sync(send)()
+    except Exception:
+        logger.warning("Failed to deliver %s", event.get("type"), exc_info=True)
+
+
+def send_to_each(deliveries):
+    """Deliver a different event to each user: ``deliveries`` yields ``(user_id, event)``."""
+    deliveries = list(deliveries)
+    packed = uses_msgpack({user_id for user_id, _ in deliveries})
+    messages = [(user_id, encode(event, packed)) for user_id, event in deliveries]
+
+    async def send():
+        channel_layer = get_channel_layer()
+        for user_id, message in messages:
+            await channel_layer.group_send(user_group(user_id), message)
+
+    try:
+        async_to_sync(send)()
+    except Exception:
+        logger.warning("Failed to deliver %d events", len(messages), exc_info=True)
+
+
+def send_to_conversation(conversation_id, event, member_ids=None):
+    """Deliver ``event`` from synchronous code; a channel layer outage is logged, not raised."""
+    if member_ids is None:
+        member_ids = membership.member_ids(conversation_id)
+    try:
+        async_to_sync(send_to_conversation_async)(conversation_id, event, member_ids)
+    except Exception:
+        logger.warning("Failed to deliver %s to conversation %s", event.get("type"), conversation_id, exc_info=True)
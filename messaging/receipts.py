@@ -0,0 +1,47 @@
+"""Coalescing of read receipts sent over the WebSocket.
+
+Read state is a per-member watermark, so "read up to message X" frames of
+one user in one conversation only ever need their maximum. ``ReadReceiptBuffer``
+keeps that maximum per conversation and flushes everything that arrived
+within ``MESSAGING_READ_FLUSH_DELAY`` seconds as one watermark update and one
+``message_read_indicator`` per conversation.
+"""
+import asyncio
+
+from django.conf import settings
+
+
+def _delay():
+    return getattr(settings, "MESSAGING_READ_FLUSH_DELAY", 0.5)
+
+
+class ReadReceiptBuffer:
+    """Pending watermarks of one user; ``flush(conversation_id, message_id)`` persists and broadcasts one."""
+
+    def __init__(self, flush):
+        self.flush_one = flush
+        self.pending = {}
+        self.task = None
+
+    def add(self, conversation_id, message_id):
+        if message_id <= self.pending.get(conversation_id, 0):
+            return
+        self.pending[conversation_id] = message_id
+        if self.task is None:
+            self.task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        for conversation_id, message_id in pending.items():
+            await self.flush_one(conversation_id, message_id)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
+
+    async def _flush_later(self):
+        await asyncio.sleep(_delay())
+        self.task = None
+        await self.flush()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Conversation, Message, MessageReaction, MessageAttachment
+from .models import Conversation, ConversationMember, Message, MessageReaction, MessageAttachment
 
 User = get_user_model()
 
@@ -77,20 +77,32 @@ class MessageSerializer(serializers.ModelSerializer):
             'video_thumbnail', 'edited_at', 'attachments'
         ]
 
+    def _watermarks(self, obj):
+        """Read watermarks of the message's conversation, loaded once per serializer context."""
+        cache = self.context.setdefault('read_watermarks', {})
+        if obj.conversation_id not in cache:
+            cache[obj.conversation_id] = dict(
+                ConversationMember.objects.filter(conversation_id=obj.conversation_id)
+                .values_list('user_id', 'last_read_message_id')
+            )
+        return cache[obj.conversation_id]
+
     def get_is_read(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return request.user in obj.read_by_users.all()
+            if obj.sender_id == request.user.id:
+                return True
+            return self._watermarks(obj).get(request.user.id, 0) >= obj.pk
         return False
 
     def get_read(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return request.user in obj.read_by_users.all()
-        return False
+        return self.get_is_read(obj)
 
     def get_read_count(self, obj):
-        return obj.read_by_users.count()
+        return sum(
+            1 for user_id, last_read in self._watermarks(obj).items()
+            if user_id != obj.sender_id and last_read >= obj.pk
+        )
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -113,60 +125,59 @@ class ConversationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def _other_user(self, obj):
+        """The other participant of a direct chat, read from the prefetched participants."""
+        if not hasattr(obj, '_other_user'):
+            request = self.context.get('request')
+            obj._other_user = None
+            if request and request.user.is_authenticated:
+                obj._other_user = next(
+                    (p for p in obj.participants.all() if p.pk != request.user.pk), None
+                )
+        return obj._other_user
+
     def get_name(self, obj):
         if obj.is_group:
             return obj.group_name or 'Group Chat'
 
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            other_users = obj.participants.exclude(id=request.user.id)
-            if other_users.exists():
-                other_user = other_users.first()
-                return other_user.display_name or other_user.username
-        
+        other_user = self._other_user(obj)
+        if other_user:
+            return other_user.display_name or other_user.username
+
         return 'Chat'
 
     def get_other_user_id(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            other_users = obj.participants.exclude(id=request.user.id)
-            if other_users.exists():
-                return other_users.first().id
-        return None
+        other_user = self._other_user(obj)
+        return other_user.id if other_user else None
 
     def get_other_user_status(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            other_users = obj.participants.exclude(id=request.user.id)
-            if other_users.exists():
-                return other_users.first().status
-        return 'offline'
+        other_user = self._other_user(obj)
+        return other_user.status if other_user else 'offline'
 
     def get_other_user_avatar(self, obj):
         if obj.is_group and obj.group_avatar:
             return obj.group_avatar.url
-        
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            other_users = obj.participants.exclude(id=request.user.id)
-            if other_users.exists():
-                other_user = other_users.first()
-                try:
-                    if other_user.avatar and other_user.avatar.name:
-                        return other_user.avatar.url
-                except (AttributeError, FileNotFoundError, ValueError):
-                    pass
+
+        other_user = self._other_user(obj)
+        if other_user:
+            try:
+                if other_user.avatar and other_user.avatar.name:
+                    return other_user.avatar.url
+            except (AttributeError, FileNotFoundError, ValueError):
+                pass
 
         return avatar_data_uri(other_user.username if other_user else None, size=80)
 
     def get_last_message(self, obj):
-        last_message = obj.messages.order_by('-created_at').first()
-        if last_message:
-            return MessageSerializer(last_message).data
-        return None
+        if not obj.last_message:
+            return None
+        context = {**self.context, 'read_watermarks': self.context.setdefault('read_watermarks', {})}
+        if 'members' in getattr(obj, '_prefetched_objects_cache', {}):
+            context['read_watermarks'][obj.pk] = {m.user_id: m.last_read_message_id for m in obj.members.all()}
+        return MessageSerializer(obj.last_message, context=context).data
 
     def get_last_message_preview(self, obj):
-        last_message = obj.messages.last()
+        last_message = obj.last_message
         if not last_message:
             return 'No messages yet'
         
@@ -185,14 +196,16 @@ class ConversationSerializer(serializers.ModelSerializer):
         return 'Message'
 
     def get_last_message_time(self, obj):
-        last_message = obj.messages.last()
-        if last_message:
-            return last_message.created_at.isoformat()
+        if obj.last_message_at:
+            return obj.last_message_at.isoformat()
         return None
 
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
+
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.exclude(sender=request.user).exclude(
-                read_by_users=request.user
-            ).count()
+            member = obj.members.filter(user=request.user).first()
+            last_read = member.last_read_message_id if member else 0
+            return obj.messages.exclude(sender=request.user).filter(id__gt=last_read).count()
@@ -1,32 +1,132 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from .models import Message
+from attachments.processing import media_processed
+from . import membership
+from .events import record_event
+from .models import Conversation, ConversationEvent, ConversationMember, Message, MessageAttachment, MessageReaction
+from .outbox import MESSAGE_NOTIFY, enqueue
+from .realtime import send_to_conversation, send_to_users
 from .serializers import MessageSerializer
-import json
 
 
 @receiver(post_save, sender=Message)
 def message_created(sender, instance, created, **kwargs):
     if not created:
         return
-    
-    try:
-        channel_layer = get_channel_layer()
-        conversation_id = instance.conversation.id
-        conversation_group_name = f'chat_{conversation_id}'
-
-        message_data = MessageSerializer(instance).data
-
-        async_to_sync(channel_layer.group_send)(
-            conversation_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_data
-            }
+
+    event = record_event(instance.conversation_id, ConversationEvent.MESSAGE_CREATED, message_id=instance.pk, user_id=instance.sender_id)
+
+    enqueue(ConversationEvent.MESSAGE_CREATED, f'message.created:{instance.pk}', {
+        'message_id': instance.pk,
+        'seq': event.seq if event else None,
+    })
+    enqueue(MESSAGE_NOTIFY, f'message.notify:{instance.pk}', {'message_id': instance.pk})
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_conversation_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # user.conversations.add(...): instance is the user, pk_set holds conversations.
+        pairs = [(conversation_id, instance.pk) for conversation_id in (pk_set or ())]
+        members = ConversationMember.objects.filter(user=instance)
+        if action == 'post_remove':
+            members = members.filter(conversation_id__in=pk_set)
+    else:
+        pairs = [(instance.pk, user_id) for user_id in (pk_set or ())]
+        members = ConversationMember.objects.filter(conversation=instance)
+        if action == 'post_remove':
+            members = members.filter(user_id__in=pk_set)
+
+    if action == 'post_add':
+        ConversationMember.objects.bulk_create(
+            [ConversationMember(conversation_id=c, user_id=u) for c, u in pairs],
+            ignore_conflicts=True
         )
-        
-        print(f"[Messaging Signal] Broadcasted message {instance.id} to group {conversation_group_name}")
-    except Exception as e:
-        print(f"[Messaging Signal] Error broadcasting message: {e}")
+    else:
+        pairs = list(members.values_list('conversation_id', 'user_id'))
+        members.delete()
+
+    membership.invalidate({c for c, _ in pairs})
+    transaction.on_commit(lambda: membership_changed(pairs))
+
+
+def membership_changed(pairs):
+    """Drop cached member lists and tell the affected sockets to recheck membership."""
+    by_conversation = {}
+    for conversation_id, user_id in pairs:
+        by_conversation.setdefault(conversation_id, []).append(user_id)
+
+    membership.invalidate(by_conversation)
+    for conversation_id, user_ids in by_conversation.items():
+        send_to_users(user_ids, {'type': 'membership_changed', 'conversation_id': conversation_id})
+
+
+@receiver(post_save, sender=Message)
+def message_edited(sender, instance, created, update_fields=None, **kwargs):
+    if not created and instance.content_changed(update_fields):
+        event = record_event(instance.conversation_id, ConversationEvent.MESSAGE_EDITED, message_id=instance.pk, user_id=instance.sender_id)
+        if event is not None:
+            enqueue(ConversationEvent.MESSAGE_EDITED, f'message.edited:{instance.conversation_id}:{event.seq}', {
+                'message_id': instance.pk,
+            })
+
+
+@receiver(post_save, sender=MessageReaction)
+def reaction_saved(sender, instance, **kwargs):
+    record_event(
+        instance.message.conversation_id, ConversationEvent.REACTION,
+        message_id=instance.message_id, user_id=instance.user_id,
+        data={'reaction_type': instance.reaction_type}
+    )
+
+
+def _deleted_with(origin, model):
+    """Whether a cascade started by deleting ``origin`` removes rows of ``model``."""
+    return isinstance(origin, model) or (isinstance(origin, QuerySet) and origin.model is model)
+
+
+@receiver(post_delete, sender=MessageReaction)
+def reaction_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, Message) or _deleted_with(origin, Conversation):
+        return
+    conversation_id = Message.objects.filter(pk=instance.message_id).values_list('conversation_id', flat=True).first()
+    if conversation_id:
+        record_event(
+            conversation_id, ConversationEvent.REACTION,
+            message_id=instance.message_id, user_id=instance.user_id,
+            data={'reaction_type': None}
+        )
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_with(origin, Conversation):
+        # The whole conversation goes away: no event log, last message or clients to update.
+        return
+    record_event(instance.conversation_id, ConversationEvent.MESSAGE_DELETED, message_id=instance.pk, user_id=instance.sender_id)
+    conversation = Conversation.objects.filter(pk=instance.conversation_id).first()
+    if conversation is None:
+        return
+    if conversation.last_message_id in (None, instance.pk):
+        conversation.refresh_last_message()
+    enqueue(ConversationEvent.MESSAGE_DELETED, f'message.deleted:{instance.pk}', {
+        'conversation_id': instance.conversation_id,
+        'message_id': instance.pk,
+    })
+
+
+@receiver(media_processed, sender=Message)
+@receiver(media_processed, sender=MessageAttachment)
+def message_media_ready(sender, instance, **kwargs):
+    message = instance.message if isinstance(instance, MessageAttachment) else instance
+    message = Message.objects.select_related('sender').prefetch_related('attachments').get(pk=message.pk)
+
+    send_to_conversation(message.conversation_id, {
+        'type': 'message_updated',
+        'message': MessageSerializer(message).data
+    })
@@ -1,3 +1,276 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.testing import make_user
+
+from . import outbox, protocol, realtime
+from .consumers import UserConsumer
+from .models import Conversation, Message, OutboxEvent
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    def send(self, content='hi'):
+        return Message.objects.create(conversation=self.conversation, sender=self.alice, content=content)
+
+    def dispatch(self):
+        return async_to_sync(outbox.dispatch_pending)()
+
+    def test_message_enqueues_frame_and_notification_separately(self):
+        message = self.send()
+        self.assertEqual(
+            set(OutboxEvent.objects.values_list('key', flat=True)),
+            {f'message.created:{message.pk}', f'message.notify:{message.pk}'},
+        )
+
+    def test_rolled_back_message_enqueues_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.send()
+            raise RuntimeError
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_enqueue_is_idempotent(self):
+        self.assertIsNotNone(outbox.enqueue('test', 'same-key', {}))
+        self.assertIsNone(outbox.enqueue('test', 'same-key', {}))
+        self.assertEqual(OutboxEvent.objects.filter(key='same-key').count(), 1)
+
+    @mock.patch('messaging.outbox.send_to_conversation_async', new_callable=mock.AsyncMock)
+    def test_failed_notification_does_not_resend_frame(self, send):
+        self.send()
+        with mock.patch('notifications.delivery.notify_new_message', side_effect=RuntimeError('boom')), \
+                self.assertLogs('messaging.outbox', 'WARNING'):
+            self.assertEqual(self.dispatch(), 2)
+        self.assertEqual(send.await_count, 1)
+
+        notify = OutboxEvent.objects.get(topic=outbox.MESSAGE_NOTIFY)
+        self.assertEqual(notify.status, 'pending')
+        self.assertEqual(notify.attempts, 1)
+        self.assertGreater(notify.next_attempt_at, timezone.now())
+        self.assertEqual(OutboxEvent.objects.get(topic='message.created').status, 'done')
+
+        # Not claimed again before its backoff has passed.
+        self.assertEqual(self.dispatch(), 0)
+
+        OutboxEvent.objects.filter(pk=notify.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with mock.patch('notifications.delivery.notify_new_message') as notify_new_message:
+            self.assertEqual(self.dispatch(), 1)
+        notify_new_message.assert_called_once()
+        self.assertEqual(send.await_count, 1)
+        self.assertEqual(OutboxEvent.objects.get(pk=notify.pk).status, 'done')
+
+    @mock.patch('messaging.outbox.send_to_conversation_async', new_callable=mock.AsyncMock)
+    def test_new_message_frame_skips_read_state_query(self, send):
+        message = self.send()
+        OutboxEvent.objects.filter(topic=outbox.MESSAGE_NOTIFY).update(status='done')
+        with CaptureQueriesContext(connection) as queries:
+            self.dispatch()
+        self.assertFalse([q for q in queries if 'last_read_message_id' in q['sql']])
+        frame = send.await_args.args[1]
+        self.assertEqual(frame['message']['id'], message.pk)
+        self.assertEqual(frame['message']['read_count'], 0)
+
+    def test_event_fails_after_max_attempts(self):
+        event = outbox.enqueue('unknown', 'unknown:1', {})
+        for attempt in range(outbox.MAX_ATTEMPTS):
+            OutboxEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+            with self.assertLogs('messaging.outbox', 'WARNING'):
+                self.assertEqual(self.dispatch(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+        self.assertEqual(self.dispatch(), 0)
+
+    def test_retry_delay_grows_and_is_capped(self):
+        self.assertEqual(outbox.retry_delay(1), outbox.RETRY_BASE_DELAY)
+        self.assertEqual(outbox.retry_delay(2), outbox.RETRY_BASE_DELAY * 2)
+        self.assertEqual(outbox.retry_delay(50), outbox.RETRY_MAX_DELAY)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def changes(self, since):
+        response = self.client.get(f'/api/messages/conversations/{self.conversation.pk}/changes/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def seq(self):
+        self.conversation.refresh_from_db()
+        return self.conversation.event_seq
+
+    def test_created_message_is_returned_after_since(self):
+        since = self.seq()
+        message = Message.objects.create(conversation=self.conversation, sender=self.bob, content='hello')
+        data = self.changes(since)
+        self.assertEqual([(e['kind'], e['message_id']) for e in data['events']], [('message.created', message.pk)])
+        self.assertEqual(data['events'][0]['message']['content'], 'hello')
+        self.assertEqual(data['latest_seq'], self.seq())
+        self.assertEqual(self.changes(data['latest_seq'])['events'], [])
+
+    def test_api_edit_is_recorded(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.alice, content='draft')
+        since = self.seq()
+        response = self.client.patch(
+            f'/api/messages/messages/{message.pk}/', {'content': 'final'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        events = self.changes(since)['events']
+        self.assertEqual([e['kind'] for e in events], ['message.edited'])
+        self.assertEqual(events[0]['message']['content'], 'final')
+
+    def test_save_without_content_change_records_nothing(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.alice, content='same')
+        since = self.seq()
+        message = Message.objects.get(pk=message.pk)
+        message.save()
+        self.assertEqual(self.seq(), since)
+
+    def test_read_receipts_do_not_touch_the_event_log(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.alice, content='hi')
+        self.conversation.refresh_from_db()
+        since = self.seq()
+        self.assertEqual(self.conversation.mark_as_read(self.bob, message.pk), 1)
+        self.assertEqual(self.seq(), since)
+
+        data = self.changes(since)
+        self.assertEqual(data['events'], [])
+        self.assertEqual(data['read_state'][str(self.bob.pk)], message.pk)
+
+    def test_pruned_history_asks_for_reset(self):
+        Message.objects.create(conversation=self.conversation, sender=self.bob, content='one')
+        Message.objects.create(conversation=self.conversation, sender=self.bob, content='two')
+        self.conversation.events.filter(seq=1).delete()
+        self.assertTrue(self.changes(0)['reset'])
+
+
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.bob, content=f'm{i}')
+            for i in range(7)
+        ]
+        self.client.force_login(self.alice)
+
+    def history(self, **params):
+        return self.client.get(f'/api/messages/conversations/{self.conversation.pk}/messages/', params)
+
+    def contents(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [m['content'] for m in response.json()['results']]
+
+    def test_latest_page_is_oldest_first(self):
+        response = self.history(limit=3)
+        self.assertEqual(self.contents(response), ['m4', 'm5', 'm6'])
+        self.assertTrue(response.json()['has_more'])
+
+    def test_before_pages_back_to_the_start(self):
+        response = self.history(limit=3, before=self.messages[4].pk)
+        self.assertEqual(self.contents(response), ['m1', 'm2', 'm3'])
+        self.assertTrue(response.json()['has_more'])
+
+        response = self.history(limit=3, before=self.messages[1].pk)
+        self.assertEqual(self.contents(response), ['m0'])
+        self.assertFalse(response.json()['has_more'])
+
+    def test_after_returns_newer_messages(self):
+        response = self.history(limit=2, after=self.messages[3].pk)
+        self.assertEqual(self.contents(response), ['m4', 'm5'])
+        self.assertTrue(response.json()['has_more'])
+        self.assertEqual(self.contents(self.history(after=self.messages[6].pk)), [])
+
+    def test_invalid_cursors_are_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.history(before='abc').status_code, 400)
+            self.assertEqual(self.history(after='1.5').status_code, 400)
+            self.assertEqual(self.history(before=10 ** 9).status_code, 400)
+            self.assertEqual(self.history(limit='x').status_code, 400)
+
+    def test_before_and_after_cannot_be_combined(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.history(before=self.messages[4].pk, after=self.messages[1].pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('after', response.json())
+
+
+class MessageDeletionTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+
+    def conversation_with(self, count):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.alice, self.bob)
+        for i in range(count):
+            Message.objects.create(conversation=conversation, sender=self.alice, content=f'm{i}')
+        return conversation
+
+    def delete_queries(self, conversation):
+        with CaptureQueriesContext(connection) as queries:
+            conversation.delete()
+        return len(queries)
+
+    def test_deleting_a_conversation_does_not_cost_queries_per_message(self):
+        small = self.delete_queries(self.conversation_with(2))
+        large = self.delete_queries(self.conversation_with(20))
+        self.assertEqual(small, large)
+        self.assertFalse(OutboxEvent.objects.filter(topic='message.deleted').exists())
+
+    def test_deleting_the_last_message_moves_last_message_back(self):
+        conversation = self.conversation_with(3)
+        first, second, last = conversation.messages.order_by('id')
+        last.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, second.pk)
+
+        since = conversation.event_seq
+        first.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, second.pk)
+        self.assertEqual(conversation.event_seq, since + 1)
+
+
+class RealtimeEncodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_msgpack_frame_only_for_msgpack_recipients(self):
+        self.assertFalse(realtime.uses_msgpack([1, 2]))
+        realtime.mark_msgpack(2)
+        self.assertTrue(realtime.uses_msgpack([1, 2]))
+        self.assertFalse(realtime.uses_msgpack([1]))
+
+    def test_encode_skips_packing_unless_asked(self):
+        event = {'type': 'chat_message', 'conversation_id': 1, 'message': {'id': 5}}
+        self.assertNotIn('packed', realtime.encode(event, packed=False))
+        self.assertEqual(protocol.loads(protocol.MSGPACK, bytes_data=realtime.encode(event)['packed']), event)
+
+    def test_msgpack_consumer_packs_unpacked_frames_itself(self):
+        consumer = UserConsumer()
+        consumer.codec = protocol.MSGPACK
+        consumer.send = mock.AsyncMock()
+        event = {'type': 'chat_message', 'conversation_id': 1, 'message': {'id': 5}}
+
+        async_to_sync(consumer.forward)(realtime.encode(event, packed=False))
 
-# Create your tests here.
+        sent = consumer.send.await_args.kwargs['bytes_data']
+        self.assertEqual(protocol.loads(protocol.MSGPACK, bytes_data=sent), event)
@@ -0,0 +1,73 @@
+"""Server-side coalescing of typing indicators.
+
+Clients send a ``typing`` frame on every keystroke. ``TypingTracker`` lives
+on the typist's socket and turns that stream into "started" and "stopped"
+transitions per conversation: a start is published at most once per
+``MESSAGING_TYPING_INTERVAL`` seconds, and a stop is published when no
+keystroke arrived for ``MESSAGING_TYPING_TIMEOUT`` seconds, when the client
+says so, when the user sends a message or when the socket closes. Clients
+therefore never have to time indicators out themselves.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+
+def _interval():
+    return getattr(settings, "MESSAGING_TYPING_INTERVAL", 3)
+
+
+def _timeout():
+    return getattr(settings, "MESSAGING_TYPING_TIMEOUT", 6)
+
+
+class TypingTracker:
+    """Typing state of one user; ``publish(conversation_id, is_typing)`` broadcasts a transition."""
+
+    def __init__(self, publish):
+        self.publish = publish
+        self.deadlines = {}
+        self.expiry_tasks = {}
+        self.last_transition = {}
+
+    def is_typing(self, conversation_id):
+        return conversation_id in self.deadlines
+
+    async def keystroke(self, conversation_id):
+        now = time.monotonic()
+        if conversation_id in self.deadlines:
+            self.deadlines[conversation_id] = now + _timeout()
+            return
+        if now - self.last_transition.get(conversation_id, float("-inf")) < _interval():
+            return
+
+        self.deadlines[conversation_id] = now + _timeout()
+        self.last_transition[conversation_id] = now
+        self.expiry_tasks[conversation_id] = asyncio.create_task(self._expire(conversation_id))
+        await self.publish(conversation_id, True)
+
+    async def stop(self, conversation_id):
+        if self.deadlines.pop(conversation_id, None) is None:
+            return
+        task = self.expiry_tasks.pop(conversation_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self.last_transition[conversation_id] = time.monotonic()
+        await self.publish(conversation_id, False)
+
+    async def stop_all(self):
+        for conversation_id in list(self.deadlines):
+            await self.stop(conversation_id)
+
+    async def _expire(self, conversation_id):
+        # Keystrokes only push the deadline back; one task per typing session.
+        while True:
+            deadline = self.deadlines.get(conversation_id)
+            if deadline is None:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await self.stop(conversation_id)
+                return
+            await asyncio.sleep(remaining)
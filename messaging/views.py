@@ -11,10 +11,14 @@ from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Q
 from django.utils import timezone
 
 from PIL import Image as PilImage
 
+from . import membership, presence
+from .events import changes_since
+from .inbox import inbox_queryset
 from .models import Conversation, Message, MessageReaction, MessageAttachment
 from .serializers import ConversationSerializer, MessageSerializer, MessageReactionSerializer, UserSimpleSerializer, MessageAttachmentSerializer
 
@@ -29,6 +33,8 @@ MAX_IMAGE_SIZE = 15 * 1024 * 1024   # 15MB
 MAX_VIDEO_SIZE = 250 * 1024 * 1024  # 250MB
 MAX_AUDIO_SIZE = 25 * 1024 * 1024   # 25MB
 
+MAX_HISTORY_PAGE = 100
+
 
 def _rewind(f):
     try:
@@ -109,7 +115,7 @@ class MessengerView(LoginRequiredMixin, TemplateView):
 
 class IsParticipantOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.participants.all()
+        return membership.is_member(obj.pk, request.user.pk)
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -118,9 +124,12 @@ class ConversationViewSet(viewsets.ModelViewSet):
     parser_classes = (JSONParser, MultiPartParser, FormParser)
 
     def get_queryset(self):
+        if self.action == "list":
+            return inbox_queryset(self.request.user)
         return (
             Conversation.objects.filter(participants=self.request.user)
-            .prefetch_related("participants", "messages")
+            .select_related("last_message__sender")
+            .prefetch_related("participants")
         )
 
     def perform_create(self, serializer):
@@ -136,40 +145,99 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"])
     def messages(self, request, pk=None):
+        """Message history, newest page first.
+
+        ``?before=<id>`` pages back through older messages and ``?after=<id>``
+        returns messages newer than the one given. Both seek on
+        ``(created_at, id)`` instead of counting and offsetting, and results
+        always come back oldest first, ready to render.
+        """
         conversation = self.get_object()
 
-        if request.user not in conversation.participants.all():
+        if not membership.is_member(conversation.pk, request.user.pk):
             raise permissions.PermissionDenied("You are not a participant in this conversation")
 
         qs = (
             Message.objects
             .filter(conversation=conversation)
             .select_related('sender')
-            .prefetch_related('read_by_users', 'reactions')
-            .order_by('created_at')
+            .prefetch_related('reactions__user', 'attachments')
         )
 
-        offset = int(request.query_params.get('offset', 0))
-        limit = int(request.query_params.get('limit', 30))
-
-        total = qs.count()
-        qs = qs[offset: offset + limit]
-
-        serializer = MessageSerializer(qs, many=True, context={'request': request})
+        try:
+            limit = min(max(int(request.query_params.get('limit', 30)), 1), MAX_HISTORY_PAGE)
+        except ValueError:
+            raise DRFValidationError({"limit": "limit must be an integer"})
+
+        after = request.query_params.get('after')
+        before = request.query_params.get('before')
+        if after and before:
+            raise DRFValidationError({"after": "before and after cannot be combined"})
+        cursor_param = 'after' if after else 'before'
+        pivot_id = after or before
+        if pivot_id:
+            try:
+                pivot_id = int(pivot_id)
+            except ValueError:
+                raise DRFValidationError({cursor_param: f"{cursor_param} must be a message id"})
+            pivot = (
+                Message.objects.filter(conversation=conversation, pk=pivot_id)
+                .values('created_at', 'pk')
+                .first()
+            )
+            if pivot is None:
+                raise DRFValidationError({cursor_param: "Unknown message"})
+
+        if after:
+            qs = qs.filter(
+                Q(created_at__gt=pivot['created_at']) |
+                Q(created_at=pivot['created_at'], pk__gt=pivot['pk'])
+            ).order_by('created_at', 'id')
+            page = list(qs[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if pivot_id:
+                qs = qs.filter(
+                    Q(created_at__lt=pivot['created_at']) |
+                    Q(created_at=pivot['created_at'], pk__lt=pivot['pk'])
+                )
+            page = list(qs.order_by('-created_at', '-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+
+        serializer = MessageSerializer(page, many=True, context={'request': request})
 
         return Response({
-            'count': total,
-            'results': serializer.data
+            'results': serializer.data,
+            'has_more': has_more,
+            'latest_seq': conversation.event_seq,
         })
 
+    @action(detail=True, methods=["get"])
+    def changes(self, request, pk=None):
+        """Events after ``?since=<seq>``, for clients catching up after a disconnect."""
+        conversation = self.get_object()
+
+        try:
+            since = max(int(request.query_params.get('since', 0)), 0)
+        except ValueError:
+            raise DRFValidationError({"since": "since must be an integer"})
+
+        return Response(changes_since(conversation, since, context={'request': request}))
+
+    @action(detail=True, methods=["post"])
+    def mark_as_read(self, request, pk=None):
+        conversation = self.get_object()
+        conversation.mark_as_read(request.user)
+        return Response({"status": "conversation marked as read"}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"])
     def search_users(self, request):
         query = request.query_params.get("q", "").strip()
         if not query or len(query) < 2:
             return Response([], status=status.HTTP_200_OK)
 
-        from django.db.models import Q
-
         users = (
             User.objects.filter(Q(username__icontains=query) | Q(display_name__icontains=query))
             .exclude(id=request.user.id)[:10]
@@ -210,30 +278,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["post"])
     def change_status(self, request):
         """Change the user's status and broadcast it"""
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
-
         new_status = request.data.get("status")
-        if new_status not in ['online', 'dnd', 'inactive', 'offline']:
+        if new_status not in presence.STATUSES:
             return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.status = new_status
-        request.user.save(update_fields=['status'])
-
-        # Broadcast status change via WebSocket
-        try:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "presence",
-                {
-                    "type": "user_status_changed",
-                    "user_id": request.user.id,
-                    "username": request.user.username,
-                    "status": new_status,
-                }
-            )
-        except Exception as e:
-            logger.warning(f"Failed to broadcast status change: {e}")
+        presence.set_status(request.user, new_status)
 
         return Response({"status": "success", "new_status": new_status}, status=status.HTTP_200_OK)
 
@@ -247,7 +296,7 @@ class MessageViewSet(viewsets.ModelViewSet):
         return (
             Message.objects.filter(conversation__participants=self.request.user)
             .select_related("sender")
-            .prefetch_related("read_by_users", "reactions")
+            .prefetch_related("reactions")
             .order_by("created_at")
         )
 
@@ -257,7 +306,7 @@ class MessageViewSet(viewsets.ModelViewSet):
             conversation_id = self.request.data.get("conversation")
             conversation = get_object_or_404(Conversation, id=conversation_id)
 
-        if self.request.user not in conversation.participants.all():
+        if not membership.is_member(conversation.pk, self.request.user.pk):
             raise permissions.PermissionDenied("You are not a participant in this conversation")
 
         message_type = (self.request.data.get("message_type") or "text").strip()
@@ -339,7 +388,7 @@ class MessageViewSet(viewsets.ModelViewSet):
                 message.delete()
                 raise DRFValidationError({"file": f"{uploaded.name}: upload failed (invalid/unsupported file)."})
 
-        message.read_by_users.add(self.request.user)
+        conversation.mark_as_read(self.request.user, message.pk)
 
     @action(detail=True, methods=["post"])
     def mark_as_read(self, request, pk=None):
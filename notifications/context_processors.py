@@ -1,8 +1,17 @@
-from notifications.models import Notification
+from django.utils.functional import SimpleLazyObject
+
+from notifications.push import unread_summary
+
 
 def notifications_context(request):
-    if request.user.is_authenticated:
-        notifications = Notification.objects.filter(user=request.user, is_read=False)[:10]
-    else:
-        notifications = []
-    return {'notifications': notifications}
+    """Unread notifications, loaded from the per-user cache only if a template uses them."""
+    def load():
+        if not request.user.is_authenticated:
+            return {'count': 0, 'notifications': []}
+        return unread_summary(request.user.id)
+
+    summary = SimpleLazyObject(load)
+    return {
+        'notifications': SimpleLazyObject(lambda: summary['notifications']),
+        'unread_notifications_count': SimpleLazyObject(lambda: summary['count']),
+    }
@@ -0,0 +1,55 @@
+"""Creation of notification rows for events published by other apps."""
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification
+from .push import push_notifications
+
+
+def notify_new_message(message):
+    """Notify the other members of ``message``'s conversation.
+
+    Unread message notifications are collapsed to one row per recipient and
+    conversation: existing rows are bumped with a single UPDATE, the rest are
+    written with one ``bulk_create``. Recipients who have the conversation
+    open are skipped. The resulting rows are pushed to the recipients' sockets.
+    Calling this again for the same message only pushes them again.
+    """
+    from messaging.membership import member_ids
+    from messaging.presence import viewer_ids
+
+    conversation_id = message.conversation_id
+    recipient_ids = set(member_ids(conversation_id)) - {message.sender_id}
+    recipient_ids -= viewer_ids(conversation_id, recipient_ids)
+    if not recipient_ids:
+        return 0
+
+    sender = message.sender
+    fields = {
+        'content': message.content or '[Media message]',
+        'sender': sender,
+        'sender_avatar': sender.avatar.url if sender.avatar else '',
+        'sender_name': sender.display_name or sender.username,
+        'message_id': message.id,
+    }
+
+    existing = Notification.objects.filter(type='message', conversation_id=conversation_id, user_id__in=recipient_ids)
+    Notification.objects.filter(
+        pk__in=existing.filter(is_read=False, message_id__lt=message.id).values('pk')
+    ).update(count=F('count') + 1, created_at=timezone.now(), **fields)
+
+    already_notified = set(
+        existing.filter(Q(is_read=False) | Q(message_id__gte=message.id)).values_list('user_id', flat=True)
+    )
+    created = Notification.objects.bulk_create(
+        [
+            Notification(user_id=user_id, type='message', conversation_id=conversation_id, **fields)
+            for user_id in recipient_ids - already_notified
+        ],
+        ignore_conflicts=True,
+    )
+
+    push_notifications(
+        existing.filter(is_read=False, message_id=message.id).select_related('sender')
+    )
+    return len(created)
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.retention import cap_unread, prune_read
+
+
+class Command(BaseCommand):
+    help = 'Delete old read notifications and cap unread notifications per user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep read notifications for this many days (default: NOTIFICATIONS_READ_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--max-unread',
+            type=int,
+            default=None,
+            help='Unread notifications kept per user (default: NOTIFICATIONS_MAX_UNREAD)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement (default: 1000)')
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches to leave room for other writers',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and prune every N seconds (default: run once)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        batching = {'batch_size': options['batch_size'], 'pause': options['pause']}
+
+        while True:
+            self.report('read', *self.timed(prune_read, options['days'], **batching))
+            self.report('excess unread', *self.timed(cap_unread, options['max_unread'], **batching))
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def timed(self, prune, *args, **kwargs):
+        started = time.monotonic()
+        deleted, batches = prune(*args, **kwargs)
+        return deleted, batches, time.monotonic() - started
+
+    def report(self, label, deleted, batches, elapsed):
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} {label} notifications in {batches} batches, {elapsed:.2f}s ({rate:.0f} rows/s)'
+        ))
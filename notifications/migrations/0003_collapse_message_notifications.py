@@ -0,0 +1,42 @@
+# Generated by Django 6.0.2 on 2026-10-17 23:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def collapse_unread_message_notifications(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+
+    unread = Notification.objects.filter(type='message', is_read=False)
+    duplicates = (
+        unread.values('user_id', 'conversation_id')
+        .annotate(n=Count('id'), latest=Max('id'))
+        .filter(n__gt=1)
+    )
+    for group in duplicates.iterator():
+        Notification.objects.filter(pk=group['latest']).update(count=group['n'])
+        unread.filter(
+            user_id=group['user_id'], conversation_id=group['conversation_id']
+        ).exclude(pk=group['latest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_remove_notification_notifications_notifi_user_id_db_index_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(collapse_unread_message_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), ('type', 'message')), fields=('user', 'conversation_id'), name='notifications_unread_message_uniq'),
+        ),
+    ]
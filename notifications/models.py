@@ -19,16 +19,28 @@ class Notification(models.Model):
     sender_name = models.CharField(max_length=255, blank=True)
 
     conversation_id = models.IntegerField(null=True, blank=True)
+    # Unread message notifications are collapsed per conversation: message_id
+    # points at the latest message and count says how many arrived.
     message_id = models.IntegerField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=1)
     
-    is_read = models.BooleanField(default=False, db_index=True)
+    is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['user', 'is_read', '-created_at']),
+            # Only unread rows are looked up by state; read ones leave this
+            # index instead of piling up in it.
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='notifications_unread_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'conversation_id'],
+                condition=models.Q(type='message', is_read=False),
+                name='notifications_unread_message_uniq',
+            ),
         ]
 
     def __str__(self):
@@ -0,0 +1,90 @@
+"""Real-time delivery of notifications and per-user change versions.
+
+New and updated notifications are pushed to the ``user_<id>`` group of
+their owner, where the user's realtime socket forwards them. Every change
+also bumps the user's notification version in the cache; the JSON endpoint
+answers ``?since=<version>`` with 304 while the version is unchanged, so
+clients without a socket can poll without hitting the database. The
+unread count and latest unread rows shown on every page are cached under the
+current version, so a bump is all it takes to invalidate them.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_TTL = 24 * 60 * 60
+
+
+def _version_key(user_id):
+    return f"notifications:version:{user_id}"
+
+
+def current_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version lost with the cache never repeats.
+        cache.add(key, int(time.time() * 1000), VERSION_TTL)
+        version = cache.get(key)
+    return version
+
+
+def _unread_key(user_id, version):
+    return f"notifications:unread:{user_id}:{version}"
+
+
+def unread_summary(user_id, limit=10):
+    """``{'count': ..., 'notifications': [...]}`` of ``user_id``'s unread notifications."""
+    from .models import Notification
+
+    # Read the version before the rows, so a write racing with this is
+    # never cached under the version that comes after it.
+    key = _unread_key(user_id, current_version(user_id))
+    summary = cache.get(key)
+    if summary is None:
+        unread = Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at')
+        notifications = list(unread[:limit])
+        count = len(notifications) if len(notifications) < limit else unread.count()
+        summary = {'count': count, 'notifications': notifications}
+        cache.set(key, summary, VERSION_TTL)
+    return summary
+
+
+def bump_versions(user_ids):
+    versions = {}
+    for user_id in set(user_ids):
+        key = _version_key(user_id)
+        try:
+            versions[user_id] = cache.incr(key)
+        except ValueError:
+            versions[user_id] = int(time.time() * 1000)
+            cache.set(key, versions[user_id], VERSION_TTL)
+    return versions
+
+
+def push_notifications(notifications):
+    """Bump the owners' versions and send each notification to its owner's sockets."""
+    from messaging.realtime import send_to_each
+
+    from .views import serialize_notification
+
+    notifications = list(notifications)
+    if not notifications:
+        return
+    versions = bump_versions(n.user_id for n in notifications)
+    send_to_each(
+        (n.user_id, {'type': 'notification', 'notification': serialize_notification(n), 'version': versions[n.user_id]})
+        for n in notifications
+    )
+
+
+def notification_snapshot(user_id, limit=10):
+    from .models import Notification
+    from .views import serialize_notification
+
+    notifications = Notification.objects.filter(user_id=user_id).select_related('sender').order_by('-created_at')[:limit]
+    return {
+        'type': 'notifications',
+        'version': current_version(user_id),
+        'notifications': [serialize_notification(n) for n in notifications],
+    }
@@ -0,0 +1,96 @@
+"""Retention of notification rows.
+
+Read notifications older than ``NOTIFICATIONS_READ_RETENTION_DAYS`` are
+deleted, and each user keeps at most ``NOTIFICATIONS_MAX_UNREAD`` unread ones
+(the oldest go first). Read rows are walked in primary key ranges of
+``batch_size`` rows and unread rows in ranges of ``batch_size`` user IDs;
+every delete covers at most ``batch_size`` rows in its own short
+transaction, so no lock is held across batches and the web process keeps
+writing while the job runs.
+Owners of deleted rows get their notification version bumped, which drops
+their cached unread summary and tells polling clients to refetch.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Subquery
+from django.utils import timezone
+
+from .models import Notification
+from .push import bump_versions
+
+
+def _delete(queryset):
+    """Delete the rows of ``queryset`` and bump their owners. Returns the number deleted."""
+    with transaction.atomic():
+        rows = list(queryset.select_for_update(skip_locked=True).values_list('pk', 'user_id'))
+        if not rows:
+            return 0
+        Notification.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+    bump_versions(user_id for _, user_id in rows)
+    return len(rows)
+
+
+def prune_read(days=None, batch_size=1000, pause=0):
+    """Delete read notifications older than ``days``. Returns ``(deleted, batches)``."""
+    days = days or getattr(settings, 'NOTIFICATIONS_READ_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+    bounds = expired.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0, 0
+
+    deleted = batches = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        deleted += _delete(expired.filter(pk__gte=start, pk__lt=start + batch_size))
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return deleted, batches
+
+
+def cap_unread(limit=None, batch_size=1000, pause=0):
+    """Delete the oldest unread notifications beyond ``limit`` per user. Returns ``(deleted, batches)``.
+
+    Users are checked in ranges of ``batch_size`` IDs. For a user over the
+    cap, everything older than their ``limit``-th newest unread notification
+    is deleted, at most ``batch_size`` rows per statement.
+    """
+    limit = limit or getattr(settings, 'NOTIFICATIONS_MAX_UNREAD', 200)
+    unread = Notification.objects.filter(is_read=False)
+
+    bounds = unread.aggregate(low=Min('user_id'), high=Max('user_id'))
+    if bounds['low'] is None:
+        return 0, 0
+
+    deleted = batches = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        over_limit = (
+            unread.filter(user_id__gte=start, user_id__lt=start + batch_size)
+            .values('user_id')
+            .annotate(n=Count('id'))
+            .filter(n__gt=limit)
+            .values_list('user_id', flat=True)
+        )
+        for user_id in list(over_limit):
+            newest = unread.filter(user_id=user_id).order_by('-created_at', '-pk')
+            oldest_kept = newest.values('created_at', 'pk')[limit - 1:limit].first()
+            if oldest_kept is None:
+                continue
+            excess = unread.filter(user_id=user_id).filter(
+                Q(created_at__lt=oldest_kept['created_at'])
+                | Q(created_at=oldest_kept['created_at'], pk__lt=oldest_kept['pk'])
+            )
+            while True:
+                batch = excess.order_by('created_at', 'pk').values('pk')[:batch_size]
+                removed = _delete(Notification.objects.filter(pk__in=Subquery(batch)))
+                if not removed:
+                    break
+                deleted += removed
+                batches += 1
+                if pause:
+                    time.sleep(pause)
+    return deleted, batches
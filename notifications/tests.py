@@ -1,3 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from users.testing import make_user
+
+from .models import Notification
+from .push import current_version, unread_summary
+from .retention import cap_unread, prune_read
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+
+    def notify(self, user, count, is_read=False, age=None):
+        created = Notification.objects.bulk_create(
+            [Notification(user=user, type='follow', content=f'n{i}', is_read=is_read) for i in range(count)]
+        )
+        if age is not None:
+            Notification.objects.filter(pk__in=[n.pk for n in created]).update(created_at=timezone.now() - age)
+        return created
+
+    def test_prune_read_deletes_only_old_read_rows(self):
+        self.notify(self.alice, 7, is_read=True, age=timedelta(days=40))
+        recent = self.notify(self.alice, 2, is_read=True, age=timedelta(days=1))
+        old_unread = self.notify(self.alice, 3, age=timedelta(days=40))
+
+        deleted, batches = prune_read(days=30, batch_size=3)
+
+        self.assertEqual(deleted, 7)
+        self.assertGreaterEqual(batches, 3)
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)),
+            {n.pk for n in recent + old_unread},
+        )
+
+    def test_cap_unread_keeps_the_newest_per_user(self):
+        oldest = self.notify(self.alice, 5, age=timedelta(days=2))
+        newest = self.notify(self.alice, 3)
+        self.notify(self.bob, 4)
+        read = self.notify(self.alice, 2, is_read=True, age=timedelta(days=3))
+
+        deleted, batches = cap_unread(limit=4, batch_size=2)
+
+        self.assertEqual(deleted, 4)
+        self.assertEqual(batches, 2)
+        kept = set(Notification.objects.filter(user=self.alice).values_list('pk', flat=True))
+        self.assertEqual(kept, {n.pk for n in newest + oldest[-1:] + read})
+        self.assertEqual(Notification.objects.filter(user=self.bob).count(), 4)
+
+    def test_pruning_refreshes_cached_unread_summary(self):
+        self.notify(self.alice, 5)
+        self.assertEqual(unread_summary(self.alice.pk)['count'], 5)
+        version = current_version(self.alice.pk)
+
+        cap_unread(limit=2)
+
+        self.assertNotEqual(current_version(self.alice.pk), version)
+        self.assertEqual(unread_summary(self.alice.pk)['count'], 2)
 
-# Create your tests here.
+    def test_command_reports_throughput(self):
+        self.notify(self.alice, 3, is_read=True, age=timedelta(days=40))
+        out = StringIO()
+        call_command('prune_notifications', '--days', '30', stdout=out)
+        self.assertIn('Deleted 3 read notifications', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
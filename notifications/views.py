@@ -1,9 +1,10 @@
 
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_protect
 from .models import Notification
+from .push import bump_versions, current_version
 
 def serialize_notification(n):
     sender_avatar = ''
@@ -25,6 +26,7 @@ def serialize_notification(n):
         'id': n.id,
         'type': n.get_type_display(),
         'content': n.content,
+        'count': n.count,
         'is_read': n.is_read,
         'created_at': n.created_at.strftime('%b %d, %H:%M'),
         'sender_avatar': sender_avatar,
@@ -33,16 +35,20 @@ def serialize_notification(n):
 
 @login_required
 def notifications_json(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:10]
+    """Latest notifications; ``?since=<version>`` answers 304 if nothing changed since."""
+    version = current_version(request.user.id)
+    if request.GET.get('since') == str(version):
+        return HttpResponseNotModified()
+
+    notifications = Notification.objects.filter(user=request.user).select_related('sender').order_by('-created_at')[:10]
     data = [serialize_notification(n) for n in notifications]
-    return JsonResponse({'notifications': data})
+    return JsonResponse({'notifications': data, 'version': version})
 
 @login_required
 def mark_notification_as_read(request, notification_id):
-    notification = Notification.objects.filter(user=request.user, id=notification_id).first()
-    if notification:
-        notification.is_read = True
-        notification.save()
+    updated = Notification.objects.filter(user=request.user, id=notification_id, is_read=False).update(is_read=True)
+    if updated:
+        bump_versions([request.user.id])
     return JsonResponse({'status': 'ok'})
 
 @login_required
@@ -50,6 +56,7 @@ def mark_notification_as_read(request, notification_id):
 def mark_all_as_read(request):
     try:
         count = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        bump_versions([request.user.id])
         return JsonResponse({'status': 'ok', 'success': True, 'updated_count': count})
     except Exception as e:
         print(f"Error marking notifications as read: {e}")
@@ -0,0 +1,71 @@
+"""Denormalized engagement counters for posts and comments.
+
+``like_count``, ``comment_count`` and ``rank`` are adjusted with single
+``UPDATE ... SET x = x + n`` statements from the like and comment signals, so
+feeds can order by the indexed ``rank`` column instead of aggregating the
+likes and comments tables. ``reconcile_counters`` repairs any drift.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
+
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+VIEW_WEIGHT = 0.01
+
+
+def adjust_post_counters(post_id, likes=0, comments=0):
+    from posts.models import Post
+
+    Post.objects.filter(pk=post_id).update(
+        like_count=F("like_count") + likes,
+        comment_count=F("comment_count") + comments,
+        rank=F("rank") + likes * LIKE_WEIGHT + comments * COMMENT_WEIGHT,
+    )
+
+
+def adjust_comment_counters(comment_id, likes=0):
+    from comments.models import Comment
+
+    Comment.objects.filter(pk=comment_id).update(
+        like_count=F("like_count") + likes,
+        rank=F("rank") + likes * LIKE_WEIGHT,
+    )
+
+
+def deleted_with(origin, *models):
+    """Whether the ``post_delete`` ``origin`` is an instance or queryset of one of ``models``.
+
+    Counter receivers use this to skip decrements on a parent that is being
+    deleted in the same cascade.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model in models
+    return isinstance(origin, models)
+
+
+def _count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("pk")).values("n")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def reconcile_post_counters(queryset):
+    """Recompute counters for ``queryset`` from the source tables; returns rows updated."""
+    from comments.models import Comment
+    from reactions.models import Like
+
+    updated = queryset.update(
+        like_count=_count_subquery(Like.objects.filter(comment__isnull=True), "post"),
+        comment_count=_count_subquery(Comment.objects.all(), "post"),
+    )
+    queryset.update(
+        rank=F("like_count") * LIKE_WEIGHT + F("comment_count") * COMMENT_WEIGHT + F("views") * VIEW_WEIGHT
+    )
+    return updated
+
+
+def reconcile_comment_counters(queryset):
+    from reactions.models import Like
+
+    updated = queryset.update(like_count=_count_subquery(Like.objects.all(), "comment"))
+    queryset.update(rank=F("like_count") * LIKE_WEIGHT)
+    return updated
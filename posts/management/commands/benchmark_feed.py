@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from posts.models import Post
+from posts.ranking import FEED_ORDERINGS
+
+
+class Command(BaseCommand):
+    help = 'Compare the cost of the feed orderings against on-the-fly aggregation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50, help='Queries per ordering (default: 50)')
+        parser.add_argument('--limit', type=int, default=10, help='Posts per page (default: 10)')
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of each ordering')
+
+    def _querysets(self):
+        # The ordering the feed used before counters and scores were stored.
+        aggregated = Post.objects.annotate(
+            n_likes=Count('likes', filter=Q(likes__comment__isnull=True), distinct=True),
+            n_comments=Count('comments', distinct=True),
+        ).order_by('-n_likes', '-n_comments', '-views', '-id')
+
+        querysets = {'aggregate': aggregated}
+        for sort, ordering in FEED_ORDERINGS.items():
+            querysets[sort] = Post.objects.order_by(*ordering)
+        return querysets
+
+    def handle(self, *args, **options):
+        runs, limit = options['runs'], options['limit']
+        self.stdout.write(f'{Post.objects.count()} posts, {runs} runs, page size {limit}')
+
+        for name, queryset in self._querysets().items():
+            page = queryset[:limit]
+            list(page)  # warm up
+
+            started = time.perf_counter()
+            for _ in range(runs):
+                list(page.values_list('id', flat=True))
+            elapsed = (time.perf_counter() - started) / runs * 1000
+
+            self.stdout.write(self.style.SUCCESS(f'{name:>10}: {elapsed:8.3f} ms/query'))
+            if options['explain']:
+                self.stdout.write(page.explain())
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.view_counter import flush_views
+
+
+class Command(BaseCommand):
+    help = 'Write buffered post view counts to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Seconds between flushes (default: POST_VIEW_FLUSH_INTERVAL)',
+        )
+        parser.add_argument('--once', action='store_true', help='Flush once and exit')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.POST_VIEW_FLUSH_INTERVAL
+
+        while True:
+            written = flush_views()
+            if written or options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Wrote {written} post views'))
+            if options['once']:
+                break
+            time.sleep(interval)
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.ranking import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed hot score of recent posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and refresh every N seconds (default: run once)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            updated, expired = refresh_hot_scores()
+            self.stdout.write(
+                self.style.SUCCESS(f'Refreshed hot scores for {updated} posts ({expired} expired)')
+            )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import backfill_timeline, release_pulled_authors, trim_timelines
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Backfill materialized home timelines from follows and drop expired entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim-only',
+            action='store_true',
+            help='Only delete entries older than TIMELINE_RETENTION_DAYS',
+        )
+
+    def handle(self, *args, **options):
+        if not options['trim_only']:
+            released = release_pulled_authors()
+            if released:
+                self.stdout.write(f'Fanning out {len(released)} authors back under TIMELINE_FANOUT_MAX_FOLLOWERS')
+            written = 0
+            for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id').iterator():
+                written += backfill_timeline(follower_id, following_id)
+            self.stdout.write(self.style.SUCCESS(f'Backfilled {written} timeline entries'))
+
+        deleted = trim_timelines()
+        self.stdout.write(self.style.SUCCESS(f'Trimmed {deleted} expired timeline entries'))
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from comments.models import Comment
+from posts.counters import reconcile_comment_counters, reconcile_post_counters
+from posts.models import Post
+from posts.timeline import reconcile_follower_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute like/comment/follower counters and engagement rank from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows updated per statement (default: 5000)',
+        )
+
+    def _reconcile(self, model, reconcile, batch_size):
+        max_id = model.objects.aggregate(m=Max('id'))['m'] or 0
+        total = 0
+        for start in range(0, max_id + 1, batch_size):
+            batch = model.objects.filter(id__gte=start, id__lt=start + batch_size)
+            total += reconcile(batch)
+        return total
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        posts = self._reconcile(Post, reconcile_post_counters, batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {posts} posts'))
+
+        comments = self._reconcile(Comment, reconcile_comment_counters, batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {comments} comments'))
+
+        users = self._reconcile(get_user_model(), reconcile_follower_counts, batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled follower counts for {users} users'))
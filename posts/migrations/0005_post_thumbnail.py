@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 22:52
+
+import social_core.storages
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_remove_post_description_remove_post_title_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.ImageField(blank=True, storage=social_core.storages.ImageCloudinaryStorage(), upload_to='thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, default='', help_text='Hash of the media set the thumbnail was built from', max_length=40),
+        ),
+    ]
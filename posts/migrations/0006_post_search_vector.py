@@ -0,0 +1,84 @@
+# Generated by Django 6.0.2 on 2026-10-17 23:10
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+SEARCH_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION posts_post_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT u.username || ' ' || u.handle FROM users_user u WHERE u.id = NEW.author_id), ''
+        )), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_post_search_vector_trigger ON posts_post;
+CREATE TRIGGER posts_post_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF content, author_id ON posts_post
+    FOR EACH ROW EXECUTE FUNCTION posts_post_search_vector_update();
+
+UPDATE posts_post p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.content, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(u.username || ' ' || u.handle, '')), 'B')
+FROM users_user u WHERE u.id = p.author_id;
+
+CREATE INDEX IF NOT EXISTS posts_post_search_gin ON posts_post USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS posts_post_content_trgm ON posts_post USING gin (content gin_trgm_ops);
+"""
+
+DROP_SEARCH_TRIGGER_SQL = """
+DROP INDEX IF EXISTS posts_post_content_trgm;
+DROP INDEX IF EXISTS posts_post_search_gin;
+DROP TRIGGER IF EXISTS posts_post_search_vector_trigger ON posts_post;
+DROP FUNCTION IF EXISTS posts_post_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SEARCH_TRIGGER_SQL)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_SEARCH_TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_thumbnail'),
+        ('users', '0007_user_previous_status'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_search_trigger, drop_search_trigger),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='post',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='posts_post_search_gin'),
+                ),
+                migrations.AddIndex(
+                    model_name='post',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['content'], name='posts_post_content_trgm', opclasses=['gin_trgm_ops']),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-17 22:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_post_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    Like = apps.get_model('reactions', 'Like')
+
+    Post.objects.update(
+        like_count=_count_subquery(Like.objects.filter(comment__isnull=True), 'post'),
+        comment_count=_count_subquery(Comment.objects.all(), 'post'),
+    )
+    Post.objects.update(rank=F('like_count') * 1.0 + F('comment_count') * 0.5 + F('views') * 0.01)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_search_vector'),
+        ('comments', '0001_initial'),
+        ('reactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rank',
+            field=models.FloatField(default=0, help_text='Engagement score, see posts.counters'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-rank', '-id'], name='posts_post_rank_idx'),
+        ),
+        migrations.RunPython(backfill_post_counters, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.core.exceptions import PermissionDenied
 
+from posts.utils import decorate_posts
+
 
 class UserIsOwnerMixin:
     def dispatch(self, request, *args, **kwargs):
@@ -7,3 +9,12 @@ class UserIsOwnerMixin:
         if not getattr(request.user, "is_authenticated", False) or getattr(obj, "author", None) != request.user:
             raise PermissionDenied("You don't have permission to edit this post.")
         return super().dispatch(request, *args, **kwargs)
+
+
+class DecoratedPostsMixin:
+    """Decorate only the current page of a post ListView with its media."""
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        page.object_list = decorate_posts(object_list)
+        return paginator, page, page.object_list, is_paginated
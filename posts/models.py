@@ -1,6 +1,9 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericRelation
+from social_core.storages import ImageCloudinaryStorage
 
 User = get_user_model()
 
@@ -11,6 +14,47 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views = models.PositiveIntegerField(default=0)
     media_set = GenericRelation('attachments.Media', related_query_name='post')
-    
+    thumbnail = models.ImageField(upload_to="thumbnails/", storage=ImageCloudinaryStorage(), blank=True)
+    thumbnail_key = models.CharField(max_length=40, blank=True, default='', help_text="Hash of the media set the thumbnail was built from")
+    search_vector = SearchVectorField(null=True, editable=False)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    rank = models.FloatField(default=0, help_text="Engagement score, see posts.counters")
+    hot_score = models.FloatField(default=0, help_text="Time-decayed score, see posts.ranking")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rank', '-id'], name='posts_post_rank_idx'),
+            models.Index(fields=['-hot_score', '-id'], name='posts_post_hot_idx'),
+            GinIndex(fields=['search_vector'], name='posts_post_search_gin'),
+            GinIndex(fields=['content'], opclasses=['gin_trgm_ops'], name='posts_post_content_trgm'),
+        ]
+
+    def __str__(self):
+        return self.content[:50]
+
+    def process_media(self):
+        from posts.thumbnail_utils import refresh_post_thumbnail
+
+        refresh_post_thumbnail(self)
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into a follower's home timeline, see posts.timeline."""
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='posts_timeline_owner_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-post'], name='posts_timeline_owner_idx'),
+            models.Index(fields=['owner', 'author'], name='posts_timeline_author_idx'),
+        ]
+
     def __str__(self):
-        return self.content[:50]
\ No newline at end of file
+        return f"{self.post_id} in timeline of {self.owner_id}"
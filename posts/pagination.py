@@ -0,0 +1,65 @@
+"""Keyset (cursor) pagination for post feeds.
+
+A cursor is an opaque, URL-safe token holding the ordering values of the
+last row a client has seen. The next page is fetched with a seek predicate
+on those values instead of an OFFSET, and one extra row is read to tell
+whether more pages exist, so no COUNT query is ever needed.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, dict) else None
+
+
+def cursor_for(obj, ordering):
+    """Return the cursor pointing just past ``obj`` in ``ordering``."""
+    return encode_cursor({field.lstrip("-"): getattr(obj, field.lstrip("-")) for field in ordering})
+
+
+def _seek_filter(ordering, values):
+    """Build ``(a < x) OR (a = x AND b < y) OR ...`` for a descending ordering."""
+    condition = Q()
+    equal_so_far = Q()
+    for field in ordering:
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal_so_far & Q(**{f"{name}__{lookup}": values[name]})
+        equal_so_far &= Q(**{name: values[name]})
+    return condition
+
+
+def keyset_page(queryset, cursor, limit, ordering=("-id",)):
+    """Return ``(items, next_cursor, has_more)`` for the page after ``cursor``.
+
+    ``ordering`` must end with a unique field so that every row has a
+    distinct position; it should match an index for the seek to be cheap.
+    """
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor)
+    if values and all(field.lstrip("-") in values for field in ordering):
+        queryset = queryset.filter(_seek_filter(ordering, values))
+
+    items = list(queryset[: limit + 1])
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = cursor_for(items[-1], ordering) if has_more and items else None
+
+    return items, next_cursor, has_more
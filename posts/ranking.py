@@ -0,0 +1,70 @@
+"""Feed orderings and the time-decayed "hot" score.
+
+``hot_score`` is written by ``refresh_hot_scores`` with one set-based UPDATE
+over the posts created inside ``POST_HOT_WINDOW_DAYS``; posts that fell out
+of the window are reset to zero by a second UPDATE. Two formulas are
+available through ``POST_HOT_FORMULA``:
+
+* ``gravity`` (Hacker News): ``(rank + 1) / (age_hours + 2) ** gravity``
+* ``log`` (Reddit): ``log10(max(rank, 1)) + created_epoch / decay_seconds``
+
+``rank`` is the engagement score maintained by ``posts.counters``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import Greatest, Log, Power
+from django.utils import timezone
+
+FEED_ORDERINGS = {
+    "hot": ("-hot_score", "-id"),
+    "top": ("-rank", "-id"),
+    "new": ("-id",),
+}
+
+# Reddit counts age from a fixed epoch so scores only grow for newer posts.
+LOG_EPOCH = 1134028003
+
+
+class EpochSeconds(Func):
+    output_field = FloatField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="EXTRACT(EPOCH FROM %(expressions)s)", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS REAL)", **extra_context)
+
+
+def get_feed_sort(request, default="top"):
+    sort = request.GET.get("sort", default)
+    return sort if sort in FEED_ORDERINGS else default
+
+
+def hot_score_expression(now=None):
+    now = now or timezone.now()
+    formula = getattr(settings, "POST_HOT_FORMULA", "gravity")
+
+    if formula == "log":
+        decay = float(getattr(settings, "POST_HOT_DECAY_SECONDS", 45000))
+        return Log(Value(10.0), Greatest(F("rank"), Value(1.0))) + (
+            EpochSeconds(F("created_at")) - Value(float(LOG_EPOCH))
+        ) / Value(decay)
+
+    gravity = float(getattr(settings, "POST_HOT_GRAVITY", 1.8))
+    age_hours = (Value(now.timestamp()) - EpochSeconds(F("created_at"))) / Value(3600.0)
+    return (F("rank") + Value(1.0)) / Power(Greatest(age_hours, Value(0.0)) + Value(2.0), Value(gravity))
+
+
+def refresh_hot_scores(queryset=None, now=None):
+    """Recompute ``hot_score`` in bulk; returns ``(updated, expired)`` row counts."""
+    from posts.models import Post
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, "POST_HOT_WINDOW_DAYS", 7))
+    queryset = Post.objects.all() if queryset is None else queryset
+
+    updated = queryset.filter(created_at__gte=cutoff).update(hot_score=hot_score_expression(now))
+    expired = queryset.filter(created_at__lt=cutoff, hot_score__gt=0).update(hot_score=0)
+    return updated, expired
@@ -0,0 +1,88 @@
+"""Post search.
+
+On PostgreSQL posts are matched against ``Post.search_vector`` (kept up to
+date by a database trigger, see migration 0006) through a GIN index and
+ranked with ``ts_rank``. Short queries, and queries the full-text parser
+finds nothing for (usually typos), fall back to trigram word similarity on
+``content``, which is served by a ``gin_trgm_ops`` index.
+
+Other databases (the SQLite test setup) use a pure-Python ranker over the
+``icontains`` matches, which is fine for test-sized tables only.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+SEARCH_CONFIG = "english"
+MIN_FULL_TEXT_LENGTH = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_posts(queryset, query):
+    """Filter ``queryset`` to posts matching ``query``, best matches first.
+
+    The returned queryset carries a ``search_rank`` annotation and is already
+    ordered by it; callers may append their own tie-breakers.
+    """
+    query = (query or "").strip()
+    if not query:
+        return queryset
+
+    if connection.vendor == "postgresql":
+        return _postgres_search(queryset, query)
+    return _python_search(queryset, query)
+
+
+def _postgres_search(queryset, query):
+    if len(query) >= MIN_FULL_TEXT_LENGTH:
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        ranked = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F("search_vector"), search_query)
+        )
+        if ranked.exists():
+            return ranked.order_by("-search_rank", "-id")
+
+    return (
+        queryset.filter(content__trigram_word_similar=query)
+        .annotate(search_rank=TrigramWordSimilarity(query, "content"))
+        .order_by("-search_rank", "-id")
+    )
+
+
+def _terms(text):
+    return [w.lower() for w in _WORD_RE.findall(text)]
+
+
+def _python_search(queryset, query):
+    terms = _terms(query) or [query.lower()]
+
+    condition = Q()
+    for term in terms:
+        condition |= Q(content__icontains=term) | Q(author__username__icontains=term)
+
+    scores = {}
+    for post_id, content, username in queryset.filter(condition).values_list(
+        "id", "content", "author__username"
+    ):
+        words = _terms(content)
+        score = sum(words.count(term) for term in terms) / (len(words) or 1)
+        score += sum(1 for term in terms if term in (username or "").lower())
+        scores[post_id] = score
+
+    if not scores:
+        return queryset.none()
+
+    ordered_ids = sorted(scores, key=lambda pk: (-scores[pk], -pk))
+    return (
+        queryset.filter(id__in=ordered_ids)
+        .annotate(
+            search_rank=Case(
+                *[When(id=pk, then=Value(len(ordered_ids) - pos)) for pos, pk in enumerate(ordered_ids)],
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("-search_rank", "-id")
+    )
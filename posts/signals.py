@@ -1,9 +1,39 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from users.models import Follow
+from user_settings.models import Block
 from .models import Post
+from .timeline import adjust_follower_count, backfill_timeline, fan_out_post, remove_from_timeline
 
 @receiver(post_save, sender=Post)
 def create_post_notification(sender, instance, created, **kwargs):
     if not created:
         return
     pass
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_post(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_follower_count(instance.following_id, 1)
+        transaction.on_commit(lambda: backfill_timeline(instance.follower_id, instance.following_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    adjust_follower_count(instance.following_id, -1)
+    remove_from_timeline(instance.follower_id, instance.following_id)
+
+
+@receiver(post_save, sender=Block)
+def block_created(sender, instance, created, **kwargs):
+    if created:
+        remove_from_timeline(instance.blocker_id, instance.blocked_user_id)
+        remove_from_timeline(instance.blocked_user_id, instance.blocker_id)
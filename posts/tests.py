@@ -1,3 +1,209 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from comments.models import Comment
+from reactions.models import Like
+from users.models import Follow
+from users.testing import make_user
+
+from . import view_counter
+from .counters import COMMENT_WEIGHT, LIKE_WEIGHT
+from .models import Post
+from .timeline import high_fanout_authors, home_timeline
+
+
+class PostAPITests(TestCase):
+    def setUp(self):
+        author = make_user('author')
+        self.posts = [Post.objects.create(author=author, content=f'post {i}') for i in range(3)]
+
+    def test_invalid_page_falls_back_to_the_first_page(self):
+        for page in ('abc', '', '0'):
+            response = self.client.get(reverse('posts:posts_api'), {'page': page})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['page'], 1)
+            self.assertIn('post 2', response.json()['html'])
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.readers = [make_user(f'reader{i}') for i in range(6)]
+        self.post = Post.objects.create(author=self.author, content='hello')
+
+    def counters(self, obj):
+        obj.refresh_from_db()
+        return obj.like_count, getattr(obj, 'comment_count', None), obj.rank
+
+    def test_likes_and_comments_adjust_post_counters(self):
+        likes = [Like.objects.create(user=reader, post=self.post) for reader in self.readers[:2]]
+        comment = Comment.objects.create(post=self.post, author=self.readers[0], content='hi')
+        self.assertEqual(self.counters(self.post), (2, 1, 2 * LIKE_WEIGHT + COMMENT_WEIGHT))
+
+        likes[0].delete()
+        comment.delete()
+        self.assertEqual(self.counters(self.post), (1, 0, LIKE_WEIGHT))
+
+    def test_comment_likes_adjust_comment_counters(self):
+        comment = Comment.objects.create(post=self.post, author=self.readers[0], content='hi')
+        like = Like.objects.create(user=self.readers[1], comment=comment)
+        self.assertEqual(self.counters(comment), (1, None, LIKE_WEIGHT))
+        self.assertEqual(self.counters(self.post), (0, 1, COMMENT_WEIGHT))
+
+        like.delete()
+        self.assertEqual(self.counters(comment), (0, None, 0))
+
+    def test_deleting_a_comment_does_not_decrement_its_likes(self):
+        comment = Comment.objects.create(post=self.post, author=self.readers[0], content='hi')
+        for reader in self.readers:
+            Like.objects.create(user=reader, comment=comment)
+
+        with CaptureQueriesContext(connection) as ctx:
+            comment.delete()
+        self.assertFalse([q for q in ctx.captured_queries if 'UPDATE "comments_comment"' in q['sql']])
+        self.assertEqual(self.counters(self.post), (0, 0, 0))
+
+    def delete_post_queries(self, engagement):
+        post = Post.objects.create(author=self.author, content='busy')
+        for reader in self.readers[:engagement]:
+            Like.objects.create(user=reader, post=post)
+            comment = Comment.objects.create(post=post, author=reader, content='hi')
+            Like.objects.create(user=reader, comment=comment)
+        with CaptureQueriesContext(connection) as ctx:
+            post.delete()
+        return len(ctx.captured_queries)
+
+    def test_deleting_a_post_does_not_update_counters_per_row(self):
+        # Warm the content type cache used by the attachments cascade.
+        self.delete_post_queries(0)
+        self.assertEqual(self.delete_post_queries(1), self.delete_post_queries(len(self.readers)))
+
+
+@override_settings(POST_VIEW_BUFFERED=True)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.post = Post.objects.create(author=self.author, content='hello')
+        self.other = Post.objects.create(author=self.author, content='world')
+
+    def views(self, post):
+        return Post.objects.values_list('views', flat=True).get(pk=post.pk)
+
+    def test_views_are_buffered_until_flushed(self):
+        for _ in range(3):
+            view_counter.record_view(self.post.pk)
+        view_counter.record_view(self.other.pk)
+
+        self.assertEqual(self.views(self.post), 0)
+        self.assertEqual(view_counter.pending_views(self.post.pk), 3)
+
+        self.assertEqual(view_counter.flush_views(), 4)
+        self.assertEqual(self.views(self.post), 3)
+        self.assertEqual(self.views(self.other), 1)
+        self.assertEqual(view_counter.pending_views(self.post.pk), 0)
+
+    def test_views_after_a_flush_are_flushed_again(self):
+        view_counter.record_view(self.post.pk)
+        view_counter.flush_views()
+        view_counter.record_view(self.post.pk)
+        view_counter.record_view(self.post.pk)
+
+        self.assertEqual(view_counter.flush_views(), 2)
+        self.assertEqual(self.views(self.post), 3)
+        self.assertEqual(view_counter.flush_views(), 0)
+
+    def test_flush_does_not_depend_on_the_recording_process(self):
+        # All state a flush needs lives in the cache, not in module globals.
+        view_counter.record_view(self.post.pk)
+        self.assertEqual(cache.get(view_counter.SLOT_KEY.format(cache.get(view_counter.SEQ_KEY))), self.post.pk)
+        self.assertEqual(view_counter.flush_views(), 1)
+
+    def test_repeat_views_in_unique_window_are_ignored(self):
+        with self.settings(POST_VIEW_UNIQUE_WINDOW=60):
+            self.assertTrue(view_counter.record_view(self.post.pk, 'u1'))
+            self.assertFalse(view_counter.record_view(self.post.pk, 'u1'))
+            self.assertTrue(view_counter.record_view(self.post.pk, 'u2'))
+        view_counter.flush_views()
+        self.assertEqual(self.views(self.post), 2)
+
+    @override_settings(POST_VIEW_BUFFERED=False)
+    def test_views_are_written_directly_without_a_shared_cache(self):
+        view_counter.record_view(self.post.pk)
+        view_counter.record_view(self.post.pk)
+
+        self.assertEqual(self.views(self.post), 2)
+        self.assertEqual(view_counter.pending_views(self.post.pk), 0)
+        self.assertEqual(view_counter.flush_views(), 0)
+
+    def test_missing_slot_waits_one_flush_then_is_skipped(self):
+        view_counter.record_view(self.post.pk)
+        # A writer that took a sequence number but never stored its slot.
+        cache.incr(view_counter.SEQ_KEY)
+        view_counter.record_view(self.other.pk)
+
+        self.assertEqual(view_counter.flush_views(), 1)
+        self.assertEqual(self.views(self.other), 0)
+        with self.assertLogs('posts.view_counter', 'WARNING'):
+            self.assertEqual(view_counter.flush_views(), 1)
+        self.assertEqual(self.views(self.other), 1)
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=2)
+class TimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user('author')
+        self.readers = [make_user(f'reader{i}') for i in range(3)]
+
+    def follow(self, reader):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(follower=reader, following=self.author)
+
+    def post(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(author=self.author, content=content)
+
+    def timeline(self, reader):
+        posts, _, _ = home_timeline(reader, limit=20)
+        return [p.content for p in posts]
+
+    def test_follower_count_follows_follows(self):
+        self.follow(self.readers[0])
+        self.follow(self.readers[1])
+        Follow.objects.filter(follower=self.readers[0]).delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.follower_count, 1)
+
+    def test_crossing_threshold_switches_to_read_time_merge(self):
+        self.follow(self.readers[0])
+        self.post('fanned out')
+        self.assertEqual(set(high_fanout_authors()), set())
+
+        self.follow(self.readers[1])
+        self.follow(self.readers[2])
+        self.assertEqual(high_fanout_authors(), {self.author.pk})
+        self.post('pulled')
+        self.assertEqual(self.timeline(self.readers[0]), ['pulled', 'fanned out'])
+
+    def test_posts_from_pull_period_survive_dropping_below_threshold(self):
+        for reader in self.readers:
+            self.follow(reader)
+        self.post('pulled')
+        Follow.objects.filter(follower=self.readers[2]).delete()
+
+        # Still pulled until the rebuild has fanned the author out again.
+        self.assertEqual(self.timeline(self.readers[0]), ['pulled'])
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.timeline_pull)
+        self.assertEqual(self.timeline(self.readers[0]), ['pulled'])
+        self.post('fanned out again')
+        self.assertEqual(self.timeline(self.readers[1]), ['fanned out again', 'pulled'])
@@ -1,8 +1,7 @@
-import os
+import hashlib
 from PIL import Image
 from io import BytesIO
 from django.core.files.base import ContentFile
-from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -115,52 +114,76 @@ def is_video_media(media_file):
     return media_file.name.lower().endswith(VIDEO_EXTENSIONS)
 
 
-def save_thumbnail_to_file(pil_image, filename_prefix):
+def thumbnail_cache_key(media, width=COLLAGE_WIDTH, height=COLLAGE_HEIGHT):
+    image_ids = [str(m.id) for m in media if is_image_media(m.file)]
+    if not image_ids:
+        return ""
+    raw = f"{width}x{height}:{','.join(image_ids)}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def save_thumbnail_to_storage(pil_image, cache_key):
+    from posts.models import Post
+
     if pil_image is None:
         return None
-    
+
+    storage = Post._meta.get_field('thumbnail').storage
+    thumbnail_name = f"thumbnails/{cache_key}.jpg"
+
     try:
-        thumbnail_path = os.path.join('thumbnails', filename_prefix + '_thumbnail.jpg')
-        thumbnail_path = thumbnail_path.replace('\\', '/')
-        thumbnail_full_path = os.path.join(settings.MEDIA_ROOT, thumbnail_path)
-        
-        os.makedirs(os.path.dirname(thumbnail_full_path), exist_ok=True)
-        
-        pil_image.save(thumbnail_full_path, 'JPEG', quality=85)
+        if storage.exists(thumbnail_name):
+            return thumbnail_name
 
-        return thumbnail_path.replace(os.sep, '/')
+        buffer = BytesIO()
+        pil_image.save(buffer, 'JPEG', quality=85)
+        return storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
     except Exception as e:
         logger.error(f"Error saving thumbnail: {e}")
         return None
 
 
-def generate_post_thumbnail(post):
-    from attachments.models import Media
+def refresh_post_thumbnail(post, media=None, force=False):
+    """Build the collage for ``post`` if its media set changed since the last build.
+
+    The collage is stored under a name derived from the ordered image IDs and
+    the collage size, so identical media sets share one file across nodes.
+    """
     from posts.models import Post
-    from django.contrib.contenttypes.models import ContentType
-    
-    media_files = Media.objects.filter(
-        content_type=ContentType.objects.get_for_model(Post),
-        object_id=post.id
-    ).order_by('uploaded_at')
-    
-    if not media_files:
-        return None
-    
-    media_list = [m.file for m in media_files]
 
-    images = [m for m in media_list if is_image_media(m)]
-    videos = [m for m in media_list if is_video_media(m)]
+    if media is None:
+        from posts.utils import get_post_media
+        media = get_post_media(post.id)
 
-    thumbnail_image = None
-    
-    if images:
-        thumbnail_image = create_collage_from_files(images)
-    elif videos:
-        return None
-    
-    if thumbnail_image:
-        thumbnail_path = save_thumbnail_to_file(thumbnail_image, f"post_{post.id}")
-        return thumbnail_path
-    
+    media_files = list(media)
+    cache_key = thumbnail_cache_key(media_files)
+
+    if not force and cache_key == post.thumbnail_key and (post.thumbnail or not cache_key):
+        return post.thumbnail.name or None
+
+    thumbnail_name = ""
+    if cache_key:
+        images = [m.file for m in media_files if is_image_media(m.file)]
+        thumbnail_name = save_thumbnail_to_storage(create_collage_from_files(images), cache_key) or ""
+        if not thumbnail_name:
+            return None
+
+    Post.objects.filter(pk=post.pk).update(thumbnail=thumbnail_name, thumbnail_key=cache_key)
+    post.thumbnail = thumbnail_name
+    post.thumbnail_key = cache_key
+    return thumbnail_name or None
+
+
+def generate_post_thumbnail(post, media=None):
+    """Return the stored collage URL if it still matches the post's media.
+
+    Collages are built by the media worker, never on the request path.
+    """
+    if media is None:
+        from posts.utils import get_post_media
+        media = get_post_media(post.id)
+
+    cache_key = thumbnail_cache_key(media)
+    if cache_key and cache_key == post.thumbnail_key and post.thumbnail:
+        return post.thumbnail.url
     return None
@@ -0,0 +1,162 @@
+"""Materialized home timelines.
+
+When a post is created its ID is pushed into the ``TimelineEntry`` rows of
+every follower of the author (fan-out on write), so reading a home timeline
+is a range scan over ``(owner, -post)`` instead of an ``IN`` over the follow
+list. Authors whose ``User.follower_count`` exceeds
+``TIMELINE_FANOUT_MAX_FOLLOWERS`` get ``User.timeline_pull`` set: they are
+not fanned out and their posts are merged in when the timeline is read
+(fan-out on read). The flag stays set when they drop below the threshold,
+since their posts from the pull period were never fanned out;
+``rebuild_timelines`` clears it and backfills those posts.
+
+Following someone backfills their latest ``TIMELINE_BACKFILL_POSTS`` posts;
+unfollowing or blocking removes them again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.models import Follow
+
+from .models import Post, TimelineEntry
+from .pagination import decode_cursor, encode_cursor
+
+HIGH_FANOUT_KEY = "timeline:high_fanout_authors"
+HIGH_FANOUT_TTL = 10 * 60
+BATCH_SIZE = 1000
+
+User = get_user_model()
+
+
+def _max_followers():
+    return getattr(settings, "TIMELINE_FANOUT_MAX_FOLLOWERS", 5000)
+
+
+def high_fanout_authors():
+    """IDs of authors whose posts are merged into timelines at read time."""
+    authors = cache.get(HIGH_FANOUT_KEY)
+    if authors is None:
+        authors = set(User.objects.filter(timeline_pull=True).values_list("pk", flat=True))
+        cache.set(HIGH_FANOUT_KEY, authors, HIGH_FANOUT_TTL)
+    return authors
+
+
+def adjust_follower_count(author_id, delta):
+    """Apply a follow (+1) or unfollow (-1) to ``author_id``'s stored follower count."""
+    User.objects.filter(pk=author_id).update(follower_count=F("follower_count") + delta)
+    if delta > 0:
+        crossed = User.objects.filter(
+            pk=author_id, follower_count__gt=_max_followers(), timeline_pull=False
+        ).update(timeline_pull=True)
+        if crossed:
+            cache.delete(HIGH_FANOUT_KEY)
+
+
+def reconcile_follower_counts(queryset):
+    """Recompute ``follower_count`` for ``queryset`` from the follow table; returns rows updated."""
+    followers = (
+        Follow.objects.filter(following=OuterRef("pk")).order_by().values("following").annotate(n=Count("pk")).values("n")
+    )
+    updated = queryset.update(follower_count=Coalesce(Subquery(followers, output_field=IntegerField()), Value(0)))
+    if queryset.filter(follower_count__gt=_max_followers(), timeline_pull=False).update(timeline_pull=True):
+        cache.delete(HIGH_FANOUT_KEY)
+    return updated
+
+
+def release_pulled_authors():
+    """Clear ``timeline_pull`` for authors back under the threshold; returns their IDs.
+
+    Their posts have to be backfilled into their followers' timelines
+    afterwards (``rebuild_timelines`` does).
+    """
+    released = User.objects.filter(timeline_pull=True, follower_count__lte=_max_followers())
+    author_ids = list(released.values_list("pk", flat=True))
+    if author_ids:
+        User.objects.filter(pk__in=author_ids).update(timeline_pull=False)
+        cache.delete(HIGH_FANOUT_KEY)
+    return author_ids
+
+
+def fan_out_post(post):
+    """Push ``post`` into the timelines of its author's followers."""
+    if User.objects.filter(pk=post.author_id, timeline_pull=True).exists():
+        return 0
+
+    followers = Follow.objects.filter(following_id=post.author_id)
+    written = 0
+    batch = []
+    for follower_id in followers.values_list("follower_id", flat=True).iterator():
+        batch.append(TimelineEntry(owner_id=follower_id, post_id=post.pk, author_id=post.author_id))
+        if len(batch) >= BATCH_SIZE:
+            written += len(TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        written += len(TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
+
+
+def backfill_timeline(owner_id, author_id, limit=None):
+    """Copy the latest posts of ``author_id`` into the timeline of ``owner_id``."""
+    if author_id in high_fanout_authors():
+        return 0
+
+    limit = limit or getattr(settings, "TIMELINE_BACKFILL_POSTS", 50)
+    post_ids = Post.objects.filter(author_id=author_id).order_by("-id").values_list("id", flat=True)[:limit]
+    entries = [TimelineEntry(owner_id=owner_id, post_id=post_id, author_id=author_id) for post_id in post_ids]
+    return len(TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True))
+
+
+def remove_from_timeline(owner_id, author_id):
+    """Drop every post of ``author_id`` from the timeline of ``owner_id``."""
+    deleted, _ = TimelineEntry.objects.filter(owner_id=owner_id, author_id=author_id).delete()
+    return deleted
+
+
+def trim_timelines(days=None):
+    """Delete timeline entries older than the retention window."""
+    days = days or getattr(settings, "TIMELINE_RETENTION_DAYS", 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = TimelineEntry.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def home_timeline(user, cursor=None, limit=10):
+    """Return ``(posts, next_cursor, has_more)`` for the home timeline of ``user``.
+
+    Materialized entries and posts of followed high-fanout authors are read
+    with the same ``id < cursor`` seek and merged newest first.
+    """
+    values = decode_cursor(cursor) or {}
+    before = values.get("id")
+
+    entries = TimelineEntry.objects.filter(owner=user)
+    if before is not None:
+        entries = entries.filter(post_id__lt=before)
+    post_ids = set(entries.order_by("-post").values_list("post_id", flat=True)[: limit + 1])
+
+    authors = high_fanout_authors()
+    if authors:
+        followed = set(
+            Follow.objects.filter(follower=user, following_id__in=authors).values_list("following_id", flat=True)
+        )
+        if followed:
+            extra = Post.objects.filter(author_id__in=followed)
+            if before is not None:
+                extra = extra.filter(id__lt=before)
+            post_ids.update(extra.order_by("-id").values_list("id", flat=True)[: limit + 1])
+
+    ordered = sorted(post_ids, reverse=True)
+    has_more = len(ordered) > limit
+    ordered = ordered[:limit]
+
+    posts_by_id = Post.objects.select_related("author").in_bulk(ordered)
+    posts = [posts_by_id[pk] for pk in ordered if pk in posts_by_id]
+
+    next_cursor = encode_cursor({"id": ordered[-1]}) if has_more and ordered else None
+    return posts, next_cursor, has_more
@@ -7,13 +7,15 @@ from .views import (
     PostImageView,
     PostSearchView,
     PostDetailView,
-    PostAPIView
+    PostAPIView,
+    HomeFeedView
 )
 
 app_name = "posts"
 
 urlpatterns = [
     path("", PostListView.as_view(), name="post_list"),
+    path("home/", HomeFeedView.as_view(), name="home_feed"),
     path("api/posts/", PostAPIView.as_view(), name="posts_api"),
     path("create/", PostCreateView.as_view(), name="post_create"),
     path("search/", PostSearchView.as_view(), name="post_search"),
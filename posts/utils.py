@@ -3,10 +3,12 @@ import logging
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch, prefetch_related_objects
 
 from attachments.models import Media
 from .forms import PostMediaForm
 from .models import Post
+from .thumbnail_utils import generate_post_thumbnail
 
 logger = logging.getLogger(__name__)
 
@@ -86,6 +88,32 @@ def get_post_media(post_id):
     ).order_by('uploaded_at')
 
 
+def post_media_prefetch():
+    return Prefetch(
+        "media_set",
+        queryset=Media.objects.order_by("uploaded_at"),
+        to_attr="prefetched_media",
+    )
+
+
+def decorate_posts(posts):
+    """Attach images, videos and thumbnail_url to a page of posts.
+
+    All media for the given posts is loaded with a single prefetch, so the
+    cost depends on the page size rather than on the number of posts.
+    """
+    posts = list(posts)
+    prefetch_related_objects(posts, post_media_prefetch())
+
+    for post in posts:
+        all_media = post.prefetched_media
+        post.images = [m for m in all_media if is_image(m)]
+        post.videos = [m for m in all_media if is_video(m)]
+        post.thumbnail_url = generate_post_thumbnail(post, media=all_media)
+
+    return posts
+
+
 def is_image(media):
     return media.is_image
 
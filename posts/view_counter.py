@@ -0,0 +1,154 @@
+"""Write-behind post view counter.
+
+Views are counted in the cache (Redis in production) and written to
+``Post.views`` in batches by the ``flush_post_views`` worker: each flush
+issues one ``UPDATE ... SET views = views + delta`` per distinct delta,
+covering every post that was viewed that many times since the last flush.
+
+Which posts have buffered views is also kept in the cache, so nothing is lost
+when a web process dies. The first view of a post since its last flush sets a
+``queued`` marker and appends the post to a journal: ``post_views:seq`` is
+incremented and the post ID stored in ``post_views:slot:<seq>``. A flush
+reads the slots after the last one it finished and moves its cursor forward.
+
+Buffering needs a cache the worker shares with the web processes, so it is
+only on when ``POST_VIEW_BUFFERED`` is set (the default with Redis). Without
+it every view is added to the row directly.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .counters import VIEW_WEIGHT
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+DELTA_KEY = "post_views:delta:{}"
+VIEWER_KEY = "post_views:viewer:{}:{}"
+QUEUED_KEY = "post_views:queued:{}"
+SLOT_KEY = "post_views:slot:{}"
+SEQ_KEY = "post_views:seq"
+CURSOR_KEY = "post_views:cursor"
+MISSING_KEY = "post_views:missing"
+FLUSH_LOCK_KEY = "post_views:flush_lock"
+DELTA_TTL = 24 * 60 * 60
+# A post whose journal slot was lost is journaled again after this long.
+QUEUED_TTL = 15 * 60
+BATCH_SIZE = 500
+
+
+def _incr(key, timeout=DELTA_TTL):
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=timeout)
+        return 1
+
+
+def record_view(post_id, viewer=None):
+    """Count a view of ``post_id``; returns False if it was a repeat view.
+
+    ``viewer`` identifies the reader (user ID, session key, ...). It is only
+    used when ``POST_VIEW_UNIQUE_WINDOW`` is set.
+    """
+    window = getattr(settings, "POST_VIEW_UNIQUE_WINDOW", 0)
+    if window and viewer is not None:
+        if not cache.add(VIEWER_KEY.format(post_id, viewer), 1, timeout=window):
+            return False
+
+    if not settings.POST_VIEW_BUFFERED:
+        Post.objects.filter(pk=post_id).update(views=F("views") + 1, rank=F("rank") + VIEW_WEIGHT)
+        return True
+
+    _incr(DELTA_KEY.format(post_id))
+    if cache.add(QUEUED_KEY.format(post_id), 1, timeout=QUEUED_TTL):
+        cache.set(SLOT_KEY.format(_incr(SEQ_KEY, timeout=None)), post_id, timeout=DELTA_TTL)
+    return True
+
+
+def pending_views(post_id):
+    return cache.get(DELTA_KEY.format(post_id)) or 0
+
+
+def _queued_posts(cursor, end):
+    """Post IDs journaled in the slots after ``cursor`` (at most ``BATCH_SIZE``) and the last slot read.
+
+    A missing slot is normally one whose writer has incremented the sequence
+    but not stored the post yet, so the scan stops there; if the same slot is
+    still missing on the next flush its writer died and it is skipped.
+    """
+    slots = list(range(cursor + 1, min(cursor + BATCH_SIZE, end) + 1))
+    found = cache.get_many([SLOT_KEY.format(slot) for slot in slots])
+    post_ids = []
+    for slot in slots:
+        post_id = found.get(SLOT_KEY.format(slot))
+        if post_id is None:
+            if cache.get(MISSING_KEY) != slot:
+                cache.set(MISSING_KEY, slot, timeout=DELTA_TTL)
+                return post_ids, slot - 1
+            logger.warning(f"Skipping lost post view journal slot {slot}")
+            continue
+        post_ids.append(post_id)
+    return post_ids, cursor + len(slots)
+
+
+def _write(post_ids):
+    """Add the buffered deltas of ``post_ids`` to the database; returns the views written."""
+    # Unmark before reading the deltas: a view arriving after this point
+    # journals the post again instead of being left behind.
+    cache.delete_many([QUEUED_KEY.format(post_id) for post_id in post_ids])
+    keys = {DELTA_KEY.format(post_id): post_id for post_id in post_ids}
+    deltas = cache.get_many(list(keys))
+
+    by_delta = {}
+    for key, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(keys[key])
+
+    written = 0
+    for delta, ids in by_delta.items():
+        Post.objects.filter(id__in=ids).update(
+            views=F("views") + delta,
+            rank=F("rank") + delta * VIEW_WEIGHT,
+        )
+        for post_id in ids:
+            try:
+                # Subtract only what was written so concurrent hits survive.
+                cache.decr(DELTA_KEY.format(post_id), delta)
+            except ValueError:
+                pass
+        written += delta * len(ids)
+    return written
+
+
+def flush_views():
+    """Write buffered view counts to the database; returns the number of views written."""
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=60):
+        return 0
+
+    written = 0
+    try:
+        end = cache.get(SEQ_KEY) or 0
+        cursor = cache.get(CURSOR_KEY) or 0
+        if cursor > end:
+            # The sequence was lost with the cache; start over.
+            cursor = 0
+        while cursor < end:
+            post_ids, done = _queued_posts(cursor, end)
+            written += _write(list(dict.fromkeys(post_ids)))
+            cache.set(CURSOR_KEY, done, timeout=None)
+            cache.delete_many([SLOT_KEY.format(slot) for slot in range(cursor + 1, done + 1)])
+            if done < min(cursor + BATCH_SIZE, end):
+                # Stopped at a missing slot; give its writer until the next flush.
+                break
+            cursor = done
+    except Exception:
+        logger.warning("Failed to flush post views", exc_info=True)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+    return written
@@ -1,20 +1,25 @@
+from django.conf import settings
 from django.contrib import messages
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import get_user_model
 from django.views import View
-from django.db.models import Q, Count
 from django.contrib.contenttypes.models import ContentType
 from django.http import JsonResponse
 from django.template.loader import render_to_string
 
 from .models import Post
-from posts.mixins import UserIsOwnerMixin
+from posts.mixins import UserIsOwnerMixin, DecoratedPostsMixin
 from attachments.models import Media
-from posts.utils import handle_media_upload, get_post_media, is_image, is_video
-from posts.thumbnail_utils import generate_post_thumbnail
+from attachments.processing import enqueue_media_job
+from posts.utils import handle_media_upload, get_post_media, decorate_posts
+from posts.search import search_posts
+from posts.pagination import keyset_page, cursor_for
+from posts.timeline import home_timeline
+from posts.ranking import FEED_ORDERINGS, get_feed_sort, refresh_hot_scores
+from posts.view_counter import record_view
 
 User = get_user_model()
 
@@ -46,10 +51,12 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         response = super().form_valid(form)
 
         handle_media_upload(self.request, self.object)
+        enqueue_media_job(self.object)
+        refresh_hot_scores(Post.objects.filter(pk=self.object.pk))
         return response
 
 
-class PostListView(ListView):
+class PostListView(DecoratedPostsMixin, ListView):
     model = Post
     template_name = "social_network/post_list.html"
     context_object_name = "posts"
@@ -60,20 +67,34 @@ class PostListView(ListView):
         query = self.request.GET.get("q")
 
         if query:
-            queryset = queryset.filter(Q(content__icontains=query))
+            return search_posts(queryset, query)
 
-        posts = queryset.annotate(
-            like_count=Count("likes", distinct=True),
-            comment_count=Count("comments", distinct=True),
-        ).order_by("-like_count", "-comment_count", "-views", "-id")
+        self.sort = get_feed_sort(self.request, settings.POST_FEED_DEFAULT_SORT)
+        return queryset.order_by(*FEED_ORDERINGS[self.sort])
 
-        for post in posts:
-            all_media = get_post_media(post.id)
-            post.images = [m for m in all_media if is_image(m)]
-            post.videos = [m for m in all_media if is_video(m)]
-            post.thumbnail_url = generate_post_thumbnail(post)
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        sort = getattr(self, "sort", None)
+        page = context.get("page_obj")
+        if sort:
+            context["sort"] = sort
+            if page and page.has_next() and page.object_list:
+                context["next_cursor"] = cursor_for(page.object_list[-1], FEED_ORDERINGS[sort])
+        return context
 
-        return posts
+
+class HomeFeedView(LoginRequiredMixin, View):
+    """Posts by the people the user follows, read from their materialized timeline."""
+
+    per_page = 10
+
+    def get(self, request):
+        posts, next_cursor, has_more = home_timeline(request.user, limit=self.per_page)
+        return render(request, "social_network/post_list.html", {
+            "posts": decorate_posts(posts),
+            "feed": "home",
+            "next_cursor": next_cursor,
+        })
 
 
 class PostDetailView(DetailView):
@@ -83,14 +104,17 @@ class PostDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
-        context["media_files"] = get_post_media(post.id)
+        context["media_files"] = get_post_media(self.object.id)
         return context
 
     def get_object(self, queryset=None):
         post = super().get_object(queryset)
-        post.views += 1
-        post.save(update_fields=["views"])
+        if self.request.user.is_authenticated:
+            viewer = f"u{self.request.user.pk}"
+        else:
+            viewer = f"s{self.request.session.session_key}" if self.request.session.session_key else None
+        if record_view(post.pk, viewer):
+            post.views += 1
         return post
 
 
@@ -116,6 +140,7 @@ class PostUpdateView(UserIsOwnerMixin, LoginRequiredMixin, UpdateView):
         ).delete()
 
         handle_media_upload(self.request, self.object)
+        enqueue_media_job(self.object)
         return response
 
     def get_success_url(self):
@@ -143,6 +168,7 @@ class PostImageView(LoginRequiredMixin, View):
             return redirect("posts:post_list")
 
         ok = handle_media_upload(request, post)
+        enqueue_media_job(post)
 
         if ok:
             messages.success(request, "Files uploaded successfully.")
@@ -152,7 +178,7 @@ class PostImageView(LoginRequiredMixin, View):
         return redirect("posts:post_list")
 
 
-class PostSearchView(ListView):
+class PostSearchView(DecoratedPostsMixin, ListView):
     model = Post
     template_name = "social_network/post_search.html"
     context_object_name = "posts"
@@ -163,20 +189,9 @@ class PostSearchView(ListView):
         query = self.request.GET.get("q")
 
         if query:
-            queryset = queryset.filter(
-                Q(content__icontains=query) | Q(author__username__icontains=query)
-            )
+            return search_posts(queryset, query)
 
-        posts = queryset.annotate(
-            like_count=Count("likes", distinct=True),
-            comment_count=Count("comments", distinct=True),
-        ).order_by("-like_count", "-comment_count", "-views", "-id")
-
-        for post in posts:
-            all_media = get_post_media(post.id)
-            post.images = [m for m in all_media if is_image(m)]
-            post.videos = [m for m in all_media if is_video(m)]
-            post.thumbnail_url = generate_post_thumbnail(post)
+        posts = queryset.order_by("-rank", "-id")
 
         return posts
 
@@ -187,46 +202,40 @@ class PostSearchView(ListView):
 
 
 class PostAPIView(View):
+    per_page = 10
+
     def get(self, request):
-        page = int(request.GET.get("page", 1))
         query = request.GET.get("q", "")
-        per_page = 10
-
-        posts_qs = Post.objects.all()
-
-        if query:
-            posts_qs = posts_qs.filter(
-                Q(title__icontains=query) | Q(description__icontains=query)
+        posts_qs = Post.objects.select_related("author")
+
+        if query or "page" in request.GET:
+            # Search results are ordered by rank, so they keep page numbers;
+            # one extra row tells us whether another page exists.
+            try:
+                page = max(int(request.GET.get("page", 1)), 1)
+            except ValueError:
+                # Like an unreadable cursor, a bad page number starts over.
+                page = 1
+            start = (page - 1) * self.per_page
+            posts_qs = search_posts(posts_qs, query) if query else posts_qs.order_by("-id")
+            posts = list(posts_qs[start:start + self.per_page + 1])
+            has_more = len(posts) > self.per_page
+            posts = posts[:self.per_page]
+            extra = {"page": page}
+        elif request.GET.get("feed") == "home" and request.user.is_authenticated:
+            posts, next_cursor, has_more = home_timeline(request.user, request.GET.get("after"), self.per_page)
+            extra = {"next_cursor": next_cursor}
+        else:
+            sort = get_feed_sort(request, default="new")
+            posts, next_cursor, has_more = keyset_page(
+                posts_qs, request.GET.get("after"), self.per_page, ordering=FEED_ORDERINGS[sort]
             )
-
-        posts_qs = posts_qs.order_by("-id")
-
-        start = (page - 1) * per_page
-        end = start + per_page
-
-        posts = posts_qs[start:end]
-        total_count = posts_qs.count()
-
-        posts_list = []
-        for post in posts:
-            all_media = get_post_media(post.id)
-            post.images = [m for m in all_media if is_image(m)]
-            post.videos = [m for m in all_media if is_video(m)]
-            post.thumbnail_url = generate_post_thumbnail(post)
-            posts_list.append(post)
+            extra = {"next_cursor": next_cursor}
 
         html = render_to_string(
             "social_network/post_item.html",
-            {"posts": posts_list, "user": request.user},
+            {"posts": decorate_posts(posts), "user": request.user},
+            request=request,
         )
 
-        has_more = end < total_count
-
-        return JsonResponse(
-            {
-                "html": html,
-                "has_more": has_more,
-                "page": page,
-                "total_count": total_count,
-            }
-        )
\ No newline at end of file
+        return JsonResponse({"html": html, "has_more": has_more, **extra})
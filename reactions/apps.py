@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ReactionsConfig(AppConfig):
     name = 'reactions'
+
+    def ready(self):
+        import reactions.signals
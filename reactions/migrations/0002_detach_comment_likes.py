@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 10:20
+
+from django.db import migrations
+
+
+def detach_comment_likes(apps, schema_editor):
+    # Comment likes used to be stored with the comment's post as well, which
+    # clashes with the (user, post) constraint of the user's post like.
+    Like = apps.get_model('reactions', 'Like')
+    Like.objects.filter(comment__isnull=False, post__isnull=False).update(post=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_comment_likes, migrations.RunPython.noop),
+    ]
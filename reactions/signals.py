@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from comments.models import Comment
+from posts.counters import adjust_post_counters, adjust_comment_counters, deleted_with
+from posts.models import Post
+from .models import Like
+
+
+def _adjust_like_counters(like, delta):
+    if like.comment_id:
+        adjust_comment_counters(like.comment_id, likes=delta)
+    elif like.post_id:
+        adjust_post_counters(like.post_id, likes=delta)
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        _adjust_like_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, Post, Comment):
+        # The liked post or comment is going away with it.
+        return
+    _adjust_like_counters(instance, -1)
@@ -1,3 +1,53 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.test import TestCase
+from django.urls import reverse
+
+from comments.models import Comment
+from posts.models import Post
+from users.testing import make_user
+
+from .models import Like
+
+
+class CommentLikeTests(TestCase):
+    def setUp(self):
+        self.user = make_user('alice')
+        self.post = Post.objects.create(author=self.user, content='hello')
+        self.comment = Comment.objects.create(post=self.post, author=self.user, content='hi')
+        self.client.force_login(self.user)
+
+    def test_comment_like_is_not_attached_to_the_post(self):
+        self.client.post(reverse('reactions:toggle_like', args=['comment', self.comment.pk]))
+        like = Like.objects.get(user=self.user, comment=self.comment)
+        self.assertIsNone(like.post_id)
+
+        # Liking the post as well does not clash with the comment like.
+        self.client.post(reverse('reactions:post_like', args=[self.post.pk]))
+        self.assertEqual(Like.objects.filter(user=self.user).count(), 2)
+
+    def test_legacy_comment_like_is_toggled_off(self):
+        # Older comment likes were stored with the comment's post set.
+        Like.objects.create(user=self.user, comment=self.comment, post=self.post)
+
+        response = self.client.post(reverse('reactions:toggle_like', args=['comment', self.comment.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Like.objects.filter(user=self.user, comment=self.comment).exists())
+
+        Like.objects.create(user=self.user, comment=self.comment, post=self.post)
+        response = self.client.post(reverse('reactions:comment_like', args=[self.comment.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Like.objects.filter(user=self.user, comment=self.comment).exists())
+
+    def test_migration_detaches_legacy_comment_likes(self):
+        legacy = Like.objects.create(user=self.user, comment=self.comment, post=self.post)
+        post_like = Like.objects.create(user=make_user('bob'), post=self.post)
+
+        detach_comment_likes = import_module('reactions.migrations.0002_detach_comment_likes').detach_comment_likes
+        detach_comment_likes(apps, None)
 
-# Create your tests here.
+        legacy.refresh_from_db()
+        post_like.refresh_from_db()
+        self.assertIsNone(legacy.post_id)
+        self.assertEqual(post_like.post_id, self.post.pk)
@@ -11,10 +11,10 @@ class ToggleLikeView(LoginRequiredMixin, View):
     def post(self, request, obj_type, obj_id):
         if obj_type == "post":
             obj = get_object_or_404(Post, pk=obj_id)
-            like, created = Like.objects.get_or_create(post=obj, user=request.user)
+            like, created = Like.objects.get_or_create(post=obj, user=request.user, comment=None)
         elif obj_type == "comment":
             obj = get_object_or_404(Comment, pk=obj_id)
-            like, created = Like.objects.get_or_create(comment=obj, user=request.user, post=obj.post)
+            like, created = Like.objects.get_or_create(comment=obj, user=request.user)
         else:
             messages.error(request, "Invalid like target.")
             return redirect(request.META.get("HTTP_REFERER", "/"))
@@ -31,7 +31,7 @@ class ToggleLikeView(LoginRequiredMixin, View):
 class CommentLikeView(LoginRequiredMixin, View):
     def post(self, request, pk):
         comment = get_object_or_404(Comment, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, comment=comment, post=None)
+        like, created = Like.objects.get_or_create(user=request.user, comment=comment)
         if not created:
             like.delete()
             messages.info(request, "Like removed from comment.")
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'channels',
     'rest_framework',
     'corsheaders',
@@ -92,6 +93,16 @@ if REDIS_URL:
 else:
     CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
     
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 print("REDIS_URL =", os.environ.get("REDIS_URL"))
 print("CHANNEL_LAYERS BACKEND =", CHANNEL_LAYERS["default"]["BACKEND"])
 
@@ -194,6 +205,52 @@ MAX_UPLOAD_SIZE = 25 * 1024 * 1024
 
 MAX_FILES_PER_UPLOAD = 10 
 
+# Post view counter (see posts/view_counter.py): with a shared cache, views are
+# buffered and written to the database by the flush_post_views worker once per
+# interval; otherwise each view is written directly. A positive unique window
+# counts each viewer once per window.
+POST_VIEW_BUFFERED = os.environ.get('POST_VIEW_BUFFERED', 'True' if REDIS_URL else 'False').lower() == 'true'
+POST_VIEW_FLUSH_INTERVAL = int(os.environ.get('POST_VIEW_FLUSH_INTERVAL', 30))
+POST_VIEW_UNIQUE_WINDOW = int(os.environ.get('POST_VIEW_UNIQUE_WINDOW', 0))
+
+# Feed ranking (see posts/ranking.py). POST_FEED_DEFAULT_SORT is one of hot, top, new.
+POST_FEED_DEFAULT_SORT = os.environ.get('POST_FEED_DEFAULT_SORT', 'top')
+POST_HOT_FORMULA = os.environ.get('POST_HOT_FORMULA', 'gravity')
+POST_HOT_GRAVITY = float(os.environ.get('POST_HOT_GRAVITY', 1.8))
+POST_HOT_DECAY_SECONDS = int(os.environ.get('POST_HOT_DECAY_SECONDS', 45000))
+POST_HOT_WINDOW_DAYS = int(os.environ.get('POST_HOT_WINDOW_DAYS', 7))
+
+# Home timeline (see posts/timeline.py). Authors with more followers than
+# TIMELINE_FANOUT_MAX_FOLLOWERS are merged in at read time instead of being
+# copied into every follower's timeline.
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000))
+TIMELINE_BACKFILL_POSTS = int(os.environ.get('TIMELINE_BACKFILL_POSTS', 50))
+TIMELINE_RETENTION_DAYS = int(os.environ.get('TIMELINE_RETENTION_DAYS', 30))
+
+# Messenger delta sync (see messaging/events.py). Clients further behind than
+# this reload the conversation instead of replaying events.
+MESSAGING_EVENT_RETENTION_DAYS = int(os.environ.get('MESSAGING_EVENT_RETENTION_DAYS', 30))
+
+# Typing indicators (see messaging/typing.py): a user's "started typing" is
+# sent at most once per interval, "stopped" after the timeout without keystrokes.
+MESSAGING_TYPING_INTERVAL = float(os.environ.get('MESSAGING_TYPING_INTERVAL', 3))
+MESSAGING_TYPING_TIMEOUT = float(os.environ.get('MESSAGING_TYPING_TIMEOUT', 6))
+
+# Read receipts sent over the WebSocket within this many seconds are merged
+# into one watermark write and one broadcast (see messaging/receipts.py).
+MESSAGING_READ_FLUSH_DELAY = float(os.environ.get('MESSAGING_READ_FLUSH_DELAY', 0.5))
+
+# Presence (see messaging/presence.py). Clients heartbeat every 30 seconds, so
+# PRESENCE_TTL must stay well above that. A user whose last socket closed is
+# shown offline after PRESENCE_OFFLINE_GRACE seconds unless they reconnect.
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', 90))
+PRESENCE_OFFLINE_GRACE = int(os.environ.get('PRESENCE_OFFLINE_GRACE', 15))
+
+# Notification retention (see notifications/retention.py), applied by the
+# prune_notifications command.
+NOTIFICATIONS_READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATIONS_READ_RETENTION_DAYS', 30))
+NOTIFICATIONS_MAX_UNREAD = int(os.environ.get('NOTIFICATIONS_MAX_UNREAD', 200))
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
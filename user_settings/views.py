@@ -221,24 +221,18 @@ class RecentActivityView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        from posts.models import Post
-        from comments.models import Comment
-        
-        following_ids = self.request.user.following.values_list('following_id', flat=True)
-        
-        if not following_ids.exists():
-            return []
-        
-        posts = Post.objects.filter(author_id__in=following_ids).select_related('author').order_by('-created_at')[:50]
-        
+        from posts.timeline import home_timeline
+
+        posts, _, _ = home_timeline(self.request.user, limit=50)
         return posts
     
     def get_context_data(self, **kwargs):
         from notifications.models import Notification
+        from notifications.push import unread_summary
         context = super().get_context_data(**kwargs)
         context['posts'] = context.pop('activities')
         context['notifications'] = Notification.objects.filter(user=self.request.user).select_related('sender').order_by('-created_at')[:50]
-        context['unread_count'] = Notification.objects.filter(user=self.request.user, is_read=False).count()
+        context['unread_count'] = unread_summary(self.request.user.id)['count']
         return context
 
 
@@ -1,3 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+
+from messaging.presence import online_following
+
 from .models import User
 
 def status_choices(request):
@@ -7,15 +11,11 @@ def status_choices(request):
 
 
 def online_friends(request):
-    online_friends_list = []
-    if request.user.is_authenticated:
-        following_ids = request.user.following.values_list('following_id', flat=True)
-        if following_ids:
-            online_friends_list = User.objects.filter(
-                id__in=following_ids,
-                status__in=['online', 'dnd', 'inactive']
-            ).order_by('display_name')
-    
+    def load():
+        if not request.user.is_authenticated:
+            return []
+        return online_following(request.user.id)
+
     return {
-        'online_friends': online_friends_list,
+        'online_friends': SimpleLazyObject(load),
     }
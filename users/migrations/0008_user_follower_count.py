@@ -0,0 +1,44 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_followers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+
+    followers = (
+        Follow.objects.filter(following=OuterRef('pk'))
+        .order_by()
+        .values('following')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    User.objects.update(follower_count=Coalesce(Subquery(followers, output_field=IntegerField()), Value(0)))
+    User.objects.filter(
+        follower_count__gt=getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+    ).update(timeline_pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_previous_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='timeline_pull',
+            field=models.BooleanField(db_index=True, default=False, help_text='Posts are merged into home timelines at read time instead of being fanned out'),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -37,6 +37,12 @@ class User(AbstractUser):
     avatar = models.ImageField(upload_to="avatars/",storage=AvatarCloudinaryStorage(),blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='offline')
     previous_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='offline', help_text="Status before logout")
+    follower_count = models.PositiveIntegerField(default=0)
+    timeline_pull = models.BooleanField(
+        default=False,
+        db_index=True,
+        help_text="Posts are merged into home timelines at read time instead of being fanned out",
+    )
 
     def __str__(self):
         return f"@{self.handle}" if self.handle else self.username
@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
+from .models import Follow
+
 User = get_user_model()
 
 
@@ -29,11 +31,14 @@ def set_status_offline_on_logout(sender, request, user, **kwargs):
     except Exception:
         return
 
-    try:
-        if getattr(user, 'status', None) and user.status != 'offline':
-            user.previous_status = user.status
-    except Exception:
-        user.previous_status = 'offline'
+    from messaging.presence import set_offline
+
+    set_offline(user)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    from messaging.presence import forget_following
 
-    user.status = 'offline'
-    user.save(update_fields=['status', 'previous_status'])
+    forget_following([instance.follower_id])
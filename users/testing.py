@@ -0,0 +1,8 @@
+"""Fixtures shared by the apps' test modules."""
+from django.contrib.auth import get_user_model
+
+
+def make_user(name):
+    return get_user_model().objects.create_user(
+        username=name, email=f'{name}@example.com', handle=name, password='x'
+    )
@@ -13,8 +13,8 @@ from .models import User, Follow
 from .forms import RegisterForm
 from user_settings.models import PrivacySettings, Friend, Block, ProfileCustomization
 from posts.models import Post
-from posts.utils import is_image, is_video, get_post_media
-from posts.thumbnail_utils import generate_post_thumbnail
+from posts.utils import decorate_posts
+from messaging.presence import STATUSES, set_status
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 
@@ -43,18 +43,9 @@ class LogoutView(View):
 
 class ProfileView(LoginRequiredMixin, View):
     def get(self, request):
-        posts = Post.objects.filter(author=request.user).order_by('-created_at')
-
-        for post in posts:
-            all_media = get_post_media(post.id)
-            post.images = [m for m in all_media if is_image(m)]
-            post.videos = [m for m in all_media if is_video(m)]
-            raw_thumbnail = generate_post_thumbnail(post)
-            if raw_thumbnail and not raw_thumbnail.startswith(('/', 'http')):
-                from django.conf import settings
-                post.thumbnail_url = settings.MEDIA_URL + raw_thumbnail
-            else:
-                post.thumbnail_url = raw_thumbnail
+        posts = decorate_posts(
+            Post.objects.filter(author=request.user).select_related('author').order_by('-created_at')
+        )
 
         try:
             profile_custom = request.user.profile_customization
@@ -143,15 +134,9 @@ class UserDetailView(DetailView):
         context['profile_custom'] = profile_custom
         
         if can_view:
-            posts = Post.objects.filter(author=profile_user).order_by('-created_at')
-
-            for post in posts:
-                all_media = get_post_media(post.id)
-                post.images = [m for m in all_media if is_image(m)]
-                post.videos = [m for m in all_media if is_video(m)]
-                post.thumbnail_url = generate_post_thumbnail(post)
-            
-            context['posts'] = posts
+            context['posts'] = decorate_posts(
+                Post.objects.filter(author=profile_user).select_related('author').order_by('-created_at')
+            )
         else:
             context['posts'] = []
         
@@ -199,9 +184,8 @@ class UnfollowView(LoginRequiredMixin, View):
 class UpdateStatusView(LoginRequiredMixin, View):
     def post(self, request):
         status = request.POST.get('status')
-        if status in ['online', 'dnd', 'inactive', 'offline']:
-            request.user.status = status
-            request.user.save()
+        if status in STATUSES:
+            set_status(request.user, status)
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'success', 'new_status': status})
         return redirect('users:profile')
\ No newline at end of file